@@ -0,0 +1 @@
+"""Local stand-in server and performance benchmarks for the MSP Control Center"""
@@ -0,0 +1,186 @@
+"""Latency, throughput and page rerun benchmarks against the local stand-in server
+
+    python -m benchmarks.bench
+    python -m benchmarks.bench --sizes 100 10000 --latency-ms 20 --json
+
+Nothing here talks to the production edge functions: every scenario starts
+its own FakeMSPServer and points the clients and the app at it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from enbox_msp.aio import AsyncMSPClient
+from enbox_msp.retry import IDEMPOTENT_ACTIONS
+from enbox_msp.transport import HttpClient
+
+from .fake_server import start_server
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+API_KEY = "msp_bench"
+ACCESS_TOKEN = "bench_token"
+
+def summarize(samples):
+    """Return p50/p99/mean in milliseconds for a list of durations in seconds"""
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {"p50_ms": value, "p99_ms": value, "mean_ms": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": cuts[49] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+    }
+
+def post_action(client, server, action, data=None):
+    """Issue one msp-api action through the sync client and return its duration"""
+    payload = {"action": action, **(data or {})}
+    headers = {"X-MSP-API-Key": API_KEY, "Content-Type": "application/json"}
+    started = time.perf_counter()
+    client.post(server.api_url, headers, payload, retry=action in IDEMPOTENT_ACTIONS).content
+    return time.perf_counter() - started
+
+def bench_latency(args):
+    """Sequential per-request latency of the sync client for list and status actions"""
+    results = []
+    for size in args.sizes:
+        server = start_server(inventory_size=size, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+        client = HttpClient()
+        emails = list(server.inventory)
+        requests_per_action = max(2, min(args.requests, 20 if size >= 100_000 else args.requests))
+        samples = [post_action(client, server, "list_enboxes") for _ in range(requests_per_action)]
+        results.append({"scenario": "latency", "action": "list_enboxes", "inventory": size,
+                        "requests": len(samples), **summarize(samples)})
+        samples = [
+            post_action(client, server, "activate_enbox", {"email": emails[idx % len(emails)]})
+            for idx in range(args.requests)
+        ]
+        results.append({"scenario": "latency", "action": "activate_enbox", "inventory": size,
+                        "requests": len(samples), **summarize(samples)})
+        server.shutdown()
+    return results
+
+def bench_bulk(args):
+    """Throughput of bulk status changes through the thread pool and the async client"""
+    server = start_server(inventory_size=args.bulk, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          max_rps=args.max_rps)
+    emails = list(server.inventory)
+    results = []
+    
+    client = HttpClient(pool_size=args.concurrency)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        samples = list(pool.map(lambda email: post_action(client, server, "deactivate_enbox", {"email": email}), emails))
+    elapsed = time.perf_counter() - started
+    results.append({"scenario": "bulk", "path": "threads", "requests": len(emails), "concurrency": args.concurrency,
+                    "requests_per_sec": len(emails) / elapsed, "throttled": server.throttled, **summarize(samples)})
+    server.throttled = 0
+    
+    async def run_async():
+        async with AsyncMSPClient(api_key=API_KEY, api_url=server.api_url, concurrency=args.concurrency) as aclient:
+            return await aclient.set_status_many(emails, activate=True)
+    
+    started = time.perf_counter()
+    outcomes = asyncio.run(run_async())
+    elapsed = time.perf_counter() - started
+    results.append({"scenario": "bulk", "path": "asyncio", "requests": len(emails), "concurrency": args.concurrency,
+                    "requests_per_sec": len(emails) / elapsed, "throttled": server.throttled,
+                    **summarize([outcome.elapsed for outcome in outcomes])})
+    
+    server.shutdown()
+    return results
+
+def bench_page(args):
+    """Manage Enboxes rerun time at each inventory size
+
+    cold_ms is a first run against an empty mirror (upstream fetch),
+    restart_ms a first run after a process restart (mirror load), and the
+    percentiles cover warm reruns served from the in-memory cache.
+    """
+    # Imported lazily so the HTTP benchmarks run without Streamlit installed
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    
+    def first_run():
+        st.cache_resource.clear()
+        app = AppTest.from_file(APP_PATH, default_timeout=300)
+        app.secrets["msp"] = {"api_key": API_KEY}
+        app.secrets["enbox"] = {"access_token": ACCESS_TOKEN}
+        started = time.perf_counter()
+        app.run()
+        elapsed = time.perf_counter() - started
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        return app, elapsed
+    
+    results = []
+    for size in args.sizes:
+        server = start_server(inventory_size=size)
+        os.environ["ENBOX_MSP_API_URL"] = server.api_url
+        os.environ["ENBOX_SEND_EMAIL_URL"] = server.send_email_url
+        os.environ["ENBOX_MIRROR_PATH"] = os.path.join(tempfile.mkdtemp(prefix="enbox-bench-"), "inventory.sqlite3")
+        
+        _, cold = first_run()
+        app, restart = first_run()
+        
+        warm = []
+        for _ in range(args.reruns):
+            started = time.perf_counter()
+            app.run()
+            warm.append(time.perf_counter() - started)
+        
+        results.append({"scenario": "page", "inventory": size, "cold_ms": cold * 1000, "restart_ms": restart * 1000,
+                        **summarize(warm)})
+        server.shutdown()
+    return results
+
+def print_table(title, rows, columns):
+    """Print result rows as an aligned text table"""
+    print(f"\n{title}")
+    widths = [max(len(column), *(len(format_value(row.get(column))) for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(format_value(row.get(column)).ljust(width) for column, width in zip(columns, widths)))
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:,.1f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+def main():
+    parser = argparse.ArgumentParser(description="MSP Control Center performance benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000], help="Inventory sizes")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per latency scenario")
+    parser.add_argument("--bulk", type=int, default=2000, help="Enboxes per bulk scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="In-flight requests for bulk scenarios")
+    parser.add_argument("--reruns", type=int, default=5, help="Warm reruns per page scenario")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency injected by the stand-in server")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency per request")
+    parser.add_argument("--max-rps", type=int, help="Stand-in server rate cap for bulk scenarios (429 beyond it)")
+    parser.add_argument("--only", choices=["latency", "bulk", "page"], nargs="+", help="Run a subset of scenarios")
+    parser.add_argument("--json", action="store_true", help="Emit one JSON object per result instead of tables")
+    args = parser.parse_args()
+    
+    scenarios = {"latency": bench_latency, "bulk": bench_bulk, "page": bench_page}
+    columns = {
+        "latency": ["action", "inventory", "requests", "p50_ms", "p99_ms", "mean_ms"],
+        "bulk": ["path", "requests", "concurrency", "requests_per_sec", "throttled", "p50_ms", "p99_ms"],
+        "page": ["inventory", "cold_ms", "restart_ms", "p50_ms", "p99_ms", "mean_ms"],
+    }
+    for name in args.only or scenarios:
+        results = scenarios[name](args)
+        if args.json:
+            for result in results:
+                print(json.dumps(result))
+        else:
+            print_table(name.title(), results, columns[name])
+
+if __name__ == "__main__":
+    main()
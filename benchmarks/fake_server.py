@@ -0,0 +1,251 @@
+"""Local stand-in for the msp-api and send-email edge functions
+
+Implements create_enbox, activate_enbox, deactivate_enbox and list_enboxes
+plus /send-email against an in-memory inventory, with injectable latency,
+error rates and a request-rate cap answered with 429 and Retry-After. The
+list_enboxes body is gzip-compressed for clients that accept it. Point the app or any script at it with:
+
+    python -m benchmarks.fake_server --inventory 10000 --latency-ms 40
+    export ENBOX_MSP_API_URL=http://127.0.0.1:8787/functions/v1/msp-api
+    export ENBOX_SEND_EMAIL_URL=http://127.0.0.1:8787/functions/v1/send-email
+"""
+import argparse
+import base64
+import gzip
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MSP_API_PATH = "/functions/v1/msp-api"
+SEND_EMAIL_PATH = "/functions/v1/send-email"
+DOMAINS = ["acme.example", "globex.example", "initech.example", "umbrella.example", "hooli.example"]
+
+def generate_inventory(size, seed=0):
+    """Build a deterministic inventory of `size` Enbox records keyed by email"""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    inventory = {}
+    for idx in range(size):
+        email = f"user{idx:06d}@{DOMAINS[idx % len(DOMAINS)]}"
+        inventory[email] = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "email": email,
+            "display_name": f"User {idx:06d}",
+            "status": "active" if rng.random() < 0.8 else "inactive",
+            "create_via": "direct" if idx % 3 else "invite",
+            "created_at": (base + timedelta(minutes=idx)).isoformat().replace("+00:00", "Z"),
+        }
+    return inventory
+
+class FakeMSPServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the fake inventory and fault-injection settings"""
+
+    daemon_threads = True
+    # Bulk benchmarks open many connections at once; the default backlog of 5
+    # makes the kernel drop SYNs and adds 1s retransmits to the tail
+    request_queue_size = 256
+
+    def __init__(self, address, inventory_size=100, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 max_rps=None, seed=0):
+        super().__init__(address, FakeMSPHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.max_rps = max_rps
+        self.throttled = 0
+        self._window = (0, 0)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.inventory = generate_inventory(inventory_size, seed)
+        self.sent = 0
+        self._list_body = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        return self.base_url + MSP_API_PATH
+
+    @property
+    def send_email_url(self):
+        return self.base_url + SEND_EMAIL_PATH
+
+    def delay(self):
+        """Sleep for the configured latency plus jitter"""
+        latency = self.latency_ms + (self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def should_throttle(self):
+        """Decide whether this request exceeds max_rps in the current one-second window"""
+        if not self.max_rps:
+            return False
+        with self.lock:
+            second, count = self._window
+            now = int(time.monotonic())
+            count = count + 1 if now == second else 1
+            self._window = (now, count)
+            if count > self.max_rps:
+                self.throttled += 1
+                return True
+            return False
+
+    def should_fail(self):
+        """Decide whether to inject a 503 for this request"""
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+    def list_body(self, compressed=False):
+        """Serialized inventory, cached until the next mutation so the stand-in is never the bottleneck"""
+        with self.lock:
+            if self._list_body is None:
+                self._list_body = {False: json.dumps(list(self.inventory.values())).encode()}
+            if compressed not in self._list_body:
+                self._list_body[compressed] = gzip.compress(self._list_body[False], compresslevel=5)
+            return self._list_body[compressed]
+
+    def handle_action(self, payload):
+        """Apply an msp-api action and return (status, body)"""
+        action = payload.get("action")
+        email = payload.get("email")
+        
+        if action == "list_enboxes":
+            return 200, self.list_body()
+        
+        if action == "create_enbox":
+            if not email or "@" not in email or not payload.get("display_name"):
+                return 400, {"error": "email and display_name are required"}
+            if payload.get("method") not in ("direct", "invite"):
+                return 400, {"error": "method must be direct or invite"}
+            if payload.get("method") == "direct" and len(payload.get("password") or "") < 8:
+                return 400, {"error": "password must be at least 8 characters"}
+            with self.lock:
+                if email in self.inventory:
+                    return 409, {"error": "Enbox already exists"}
+                record = {
+                    "id": str(uuid.uuid4()),
+                    "email": email,
+                    "display_name": payload["display_name"],
+                    "status": "active" if payload["method"] == "direct" else "pending",
+                    "create_via": payload["method"],
+                    "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                }
+                self.inventory[email] = record
+                self._list_body = None
+            return 201, record
+        
+        if action in ("activate_enbox", "deactivate_enbox"):
+            with self.lock:
+                if email not in self.inventory:
+                    return 404, {"error": "Enbox not found"}
+                status = "active" if action == "activate_enbox" else "inactive"
+                self.inventory[email] = {**self.inventory[email], "status": status}
+                self._list_body = None
+            return 200, {"email": email, "status": status}
+        
+        return 400, {"error": f"Unknown action: {action}"}
+
+    def handle_send(self, payload):
+        """Accept a send-email request and return (status, body)"""
+        if not payload.get("to") or not payload.get("subject"):
+            return 400, {"error": "to and subject are required"}
+        for attachment in payload.get("attachments") or []:
+            try:
+                base64.b64decode(attachment.get("content") or "", validate=True)
+            except (AttributeError, ValueError):
+                return 400, {"error": f"Attachment {attachment.get('filename')!r} is not valid base64"}
+        with self.lock:
+            self.sent += 1
+        return 200, {"id": str(uuid.uuid4()), "status": "scheduled" if payload.get("scheduled_at") else "sent"}
+
+class FakeMSPHandler(BaseHTTPRequestHandler):
+    """Request handler dispatching to the owning FakeMSPServer"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, Nagle plus delayed
+    # ACKs add ~40ms to every small keep-alive response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self.respond(400, {"error": "Invalid JSON"})
+        
+        if self.server.should_throttle():
+            return self.respond(429, {"error": "Rate limit exceeded"}, {"Retry-After": "1"})
+        
+        self.server.delay()
+        if self.server.should_fail():
+            return self.respond(503, {"error": "Injected failure"})
+        
+        if self.path == MSP_API_PATH:
+            if not self.headers.get("X-MSP-API-Key"):
+                return self.respond(401, {"error": "Missing X-MSP-API-Key"})
+            if payload.get("action") == "list_enboxes" and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                return self.respond(200, self.server.list_body(compressed=True), {"Content-Encoding": "gzip"})
+            return self.respond(*self.server.handle_action(payload))
+        
+        if self.path == SEND_EMAIL_PATH:
+            if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+                return self.respond(401, {"error": "Missing bearer token"})
+            return self.respond(*self.server.handle_send(payload))
+        
+        self.respond(404, {"error": "Not found"})
+
+    def respond(self, status, body, headers=None):
+        raw = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+def start_server(host="127.0.0.1", port=0, **options):
+    """Start a FakeMSPServer on a background thread and return it"""
+    server = FakeMSPServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-msp-server", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--inventory", type=int, default=100, help="Number of Enboxes to pre-populate")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Fixed latency added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random latency added on top")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--max-rps", type=int, help="Answer requests beyond this rate with 429 and Retry-After")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    server = FakeMSPServer(
+        (args.host, args.port),
+        inventory_size=args.inventory,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        max_rps=args.max_rps,
+        seed=args.seed,
+    )
+    print(f"MSP API:    {server.api_url}")
+    print(f"Send Email: {server.send_email_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
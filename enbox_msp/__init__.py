@@ -0,0 +1 @@
+"""Enbox MSP API client library shared by the Streamlit app and scripts"""
@@ -0,0 +1,4 @@
+"""Entry point for python -m enbox_msp"""
+from .cli import main
+
+raise SystemExit(main())
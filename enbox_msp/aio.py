@@ -0,0 +1,202 @@
+"""Asyncio client for the MSP API and send-email endpoint, built for high fan-out
+
+Usage from synchronous code, including a Streamlit script:
+
+    async def deactivate_all(emails):
+        async with AsyncMSPClient(api_key=api_key) as client:
+            return await client.set_status_many(emails, activate=False)
+
+    results = asyncio.run(deactivate_all(emails))
+"""
+import asyncio
+import time
+
+import aiohttp
+
+from . import config, metrics
+from .api import ApiResult
+from .ratelimit import get_limiter, parse_retry_after
+from .retry import MAX_RETRIES, RETRY_STATUS_CODES, THROTTLED_STATUS_CODE, IDEMPOTENT_ACTIONS, backoff_delay
+
+DEFAULT_CONCURRENCY = 64
+
+class AsyncMSPClient:
+    """Async client with a shared connection pool and a bounded number of in-flight calls
+
+    Use as an async context manager; the connection pool lives as long as the
+    `async with` block and is shared by every call made inside it.
+    """
+
+    def __init__(self, api_key=None, access_token=None, api_url=None, send_email_url=None,
+                 concurrency=DEFAULT_CONCURRENCY, max_retries=MAX_RETRIES,
+                 timeout=(config.CONNECT_TIMEOUT_SECONDS, config.READ_TIMEOUT_SECONDS), attachments=None):
+        self.api_key = api_key
+        self.access_token = access_token
+        self.api_url = api_url or config.api_base_url()
+        self.send_email_url = send_email_url or config.send_email_url()
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        self._attachments = attachments
+        self._semaphore = None
+        self._session = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    @property
+    def attachments(self):
+        """AttachmentStore that resolves attachment references in send_email payloads"""
+        if self._attachments is None:
+            from .attachments import AttachmentStore
+            self._attachments = AttachmentStore()
+        return self._attachments
+
+    async def _post(self, action, url, headers, payload, retry, key, body=None):
+        """POST JSON within the concurrency and rate limits, retrying transient failures when allowed
+
+        A sized, re-iterable `body` is streamed in place of `payload`.
+        """
+        attempts = self.max_retries + 1 if retry else 1
+        limiter = get_limiter(url)
+        started = time.perf_counter()
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                attempt += 1
+                await limiter.acquire_async()
+                try:
+                    request = {"json": payload} if body is None else {"data": _stream(body)}
+                    async with self._session.post(url, headers=headers, **request) as response:
+                        status = response.status
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        try:
+                            data = await response.json(content_type=None)
+                        except ValueError:
+                            data = await response.text()
+                except asyncio.CancelledError:
+                    limiter.release()
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    limiter.release(error=True)
+                    if attempt >= attempts:
+                        elapsed = time.perf_counter() - started
+                        metrics.record_request(action, "error", elapsed)
+                        metrics.record_error(action, e)
+                        return ApiResult(action, False, error=str(e) or type(e).__name__,
+                                         elapsed=elapsed, attempts=attempt, key=key)
+                except Exception as e:
+                    # Anything else, e.g. an undecodable body, must still hand the slot back
+                    limiter.release(error=True)
+                    metrics.record_request(action, "error", time.perf_counter() - started)
+                    metrics.record_error(action, e)
+                    raise
+                else:
+                    limiter.release(status, retry_after)
+                    throttled = status == THROTTLED_STATUS_CODE and attempt <= self.max_retries
+                    if not throttled and (status not in RETRY_STATUS_CODES or attempt >= attempts):
+                        elapsed = time.perf_counter() - started
+                        metrics.record_request(action, status, elapsed)
+                        return ApiResult(action, status in (200, 201), status=status, data=data,
+                                         elapsed=elapsed, attempts=attempt, key=key)
+                metrics.record_retry(action)
+                # Any Retry-After is enforced by the limiter before the next attempt
+                await asyncio.sleep(backoff_delay(attempt))
+
+    async def call(self, action, data=None, key=None):
+        """Call an MSP API action"""
+        if not self.api_key:
+            return ApiResult(action, False, error="API key not configured", key=key)
+        headers = {"X-MSP-API-Key": self.api_key, "Content-Type": "application/json"}
+        payload = {"action": action, **(data or {})}
+        return await self._post(action, self.api_url, headers, payload, action in IDEMPOTENT_ACTIONS, key)
+
+    async def list_enboxes(self):
+        """List all managed Enboxes"""
+        return await self.call("list_enboxes")
+
+    async def create_enbox(self, payload, key=None):
+        """Create a managed Enbox from a create_enbox payload"""
+        return await self.call("create_enbox", payload, key=key if key is not None else payload.get("email"))
+
+    async def activate_enbox(self, email):
+        """Activate a managed Enbox"""
+        return await self.call("activate_enbox", {"email": email}, key=email)
+
+    async def deactivate_enbox(self, email):
+        """Deactivate a managed Enbox"""
+        return await self.call("deactivate_enbox", {"email": email}, key=email)
+
+    async def send_email(self, email_data, key=None):
+        """Send an email via the send-email endpoint"""
+        if not self.access_token:
+            return ApiResult("send_email", False, error="Access token not configured", key=key)
+        headers = {"Authorization": f"Bearer {self.access_token}", "Content-Type": "application/json"}
+        body = None
+        if email_data.get("attachments"):
+            try:
+                body = self.attachments.body(email_data)
+            except OSError as e:
+                return ApiResult("send_email", False, error=str(e), key=key)
+            headers["Content-Length"] = str(len(body))
+        return await self._post("send_email", self.send_email_url, headers, email_data, False, key, body)
+
+    async def map(self, func, items, on_result=None, key=None):
+        """Await func(item) for every item, with at most `concurrency` in flight
+
+        on_result is called with each result as it completes, on the event
+        loop's thread, so it can safely update UI elements. An exception
+        from func becomes a failed ApiResult keyed by key(item) (the item
+        itself by default), so one bad item never stops the others.
+        """
+        results = []
+        pending = iter(items)
+        action = getattr(func, "__name__", "request")
+
+        async def worker():
+            # All workers drain one iterator, so items are never materialized as tasks up front
+            for item in pending:
+                try:
+                    result = await func(item)
+                except Exception as e:
+                    result = ApiResult(action, False, error=str(e) or type(e).__name__,
+                                       key=key(item) if key else item)
+                results.append(result)
+                if on_result:
+                    on_result(result)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # Stop the other workers before __aexit__ closes the session under them;
+            # a request cut off there may already have been delivered
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        return results
+
+    async def set_status_many(self, emails, activate, on_result=None):
+        """Activate or deactivate many Enboxes concurrently"""
+        func = self.activate_enbox if activate else self.deactivate_enbox
+        return await self.map(func, emails, on_result)
+
+    async def create_many(self, payloads, on_result=None):
+        """Create many Enboxes concurrently"""
+        return await self.map(self.create_enbox, payloads, on_result)
+
+    async def send_many(self, payloads, on_result=None):
+        """Send many emails concurrently"""
+        return await self.map(self.send_email, payloads, on_result)
+
+async def _stream(body):
+    for chunk in body:
+        yield chunk
@@ -0,0 +1,246 @@
+"""Synchronous MSP API layer shared by the Streamlit app and the command line
+
+Nothing here imports Streamlit, and the HTTP stack is only imported when the
+first request is made, so scripts that fail validation exit without paying
+for it.
+"""
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from . import config
+from .models import Enbox
+from .retry import IDEMPOTENT_ACTIONS
+from .streaming import STREAM_CHUNK_BYTES, iter_json_array
+
+CREATE_METHODS = ["direct", "invite"]
+PASSWORD_MIN_LENGTH = 8
+
+class ApiError(RuntimeError):
+    """An upstream call failed; status is the HTTP status code if one was received"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+@dataclass
+class ApiResult:
+    """Outcome of one upstream call"""
+    action: str
+    ok: bool
+    status: Optional[int] = None
+    data: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    attempts: int = 1
+    # Identifies the item a fan-out call was made for, e.g. an email address
+    key: Any = None
+
+    @property
+    def detail(self):
+        """Human-readable outcome for result tables"""
+        if self.error:
+            return self.error
+        if self.ok:
+            return "OK"
+        body = self.data if isinstance(self.data, str) else json.dumps(self.data)
+        return f"Error {self.status}: {body}"
+
+def validate_enbox_fields(email, display_name, create_via, password="", password_confirm=None):
+    """Return the validation errors for a create_enbox request"""
+    errors = []
+
+    if not email or "@" not in email:
+        errors.append("Valid email address is required")
+
+    if not display_name:
+        errors.append("Display name is required")
+
+    if create_via not in CREATE_METHODS:
+        errors.append("Method must be 'direct' or 'invite'")
+    elif create_via == "direct":
+        if not password:
+            errors.append("Password is required for direct creation")
+        elif len(password) < PASSWORD_MIN_LENGTH:
+            errors.append(f"Password must be at least {PASSWORD_MIN_LENGTH} characters long")
+        elif password_confirm is not None and password != password_confirm:
+            errors.append("Passwords do not match")
+
+    return errors
+
+def build_create_payload(email, display_name, create_via, password=""):
+    """Build the create_enbox payload"""
+    payload = {
+        "method": create_via,
+        "email": email,
+        "display_name": display_name
+    }
+
+    if create_via == "direct":
+        payload["password"] = password
+
+    return payload
+
+def parse_enbox_csv(data):
+    """Parse and validate a bulk import CSV into row dicts with their validation errors"""
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    rows = []
+    # Row numbers match the spreadsheet, counting the header as row 1
+    for line_no, record in enumerate(reader, 2):
+        record = {(key or "").strip().lower(): (value or "").strip() for key, value in record.items()}
+        row = {
+            "row": line_no,
+            "email": record.get("email", ""),
+            "display_name": record.get("display_name", ""),
+            "method": (record.get("method") or record.get("create_via") or "").lower(),
+            "password": record.get("password", ""),
+        }
+        row["errors"] = validate_enbox_fields(row["email"], row["display_name"], row["method"], row["password"])
+        rows.append(row)
+    return rows
+
+class MSPClient:
+    """Blocking client for the MSP API and send-email endpoint
+
+    post_action and post_email return (response, error) for callers that
+    want the raw response; the named methods return an ApiResult like
+    AsyncMSPClient does. Pass `http` to share a pooled HttpClient.
+    """
+
+    def __init__(self, api_key=None, access_token=None, api_url=None, send_email_url=None, http=None,
+                 attachments=None):
+        self.api_key = api_key
+        self.access_token = access_token
+        self.api_url = api_url or config.api_base_url()
+        self.send_email_url = send_email_url or config.send_email_url()
+        self._http = http
+        self._attachments = attachments
+
+    @property
+    def http(self):
+        if self._http is None:
+            # requests is the slowest import in a short-lived script; defer it to the first call
+            from .transport import HttpClient
+            self._http = HttpClient()
+        return self._http
+
+    @property
+    def attachments(self):
+        """AttachmentStore that resolves attachment references in send_email payloads"""
+        if self._attachments is None:
+            from .attachments import AttachmentStore
+            self._attachments = AttachmentStore()
+        return self._attachments
+
+    def post_action(self, action, data=None, stream=False):
+        """POST an MSP API action and return (response, error)
+
+        With stream=True the body is left unread so it can be parsed as it
+        arrives; close the response when done.
+        """
+        if not self.api_key:
+            return None, "API key not configured"
+
+        headers = {
+            "X-MSP-API-Key": self.api_key,
+            "Content-Type": "application/json"
+        }
+
+        try:
+            # Prepare payload with action
+            payload = {"action": action}
+            if data:
+                payload.update(data)
+
+            response = self.http.post(
+                self.api_url, headers, payload, retry=action in IDEMPOTENT_ACTIONS, action=action, stream=stream
+            )
+            return response, None
+        except Exception as e:
+            return None, str(e)
+
+    def post_email(self, email_data):
+        """POST to the send-email endpoint and return (response, error)
+
+        Attachment references in email_data["attachments"] are streamed from
+        the attachment store into the request body.
+        """
+        if not self.access_token:
+            return None, "Access token not configured"
+
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json"
+        }
+
+        try:
+            body = self.attachments.body(email_data) if email_data.get("attachments") else None
+            response = self.http.post(self.send_email_url, headers, email_data, action="send_email", body=body)
+            return response, None
+        except Exception as e:
+            return None, str(e)
+
+    def call(self, action, data=None, key=None):
+        """Call an MSP API action"""
+        started = time.perf_counter()
+        response, error = self.post_action(action, data)
+        return to_result(action, response, error, time.perf_counter() - started, key)
+
+    def list_enboxes(self):
+        """List all managed Enboxes"""
+        return self.call("list_enboxes")
+
+    def iter_enboxes(self):
+        """Yield managed Enboxes as Enbox objects while the list_enboxes response streams in
+
+        Raises ApiError for a failed call and NotAnArray if the body is not a list.
+        """
+        response, error = self.post_action("list_enboxes", stream=True)
+        if error:
+            raise ApiError(error)
+        with response:
+            if response.status_code != 200:
+                raise ApiError(f"Error {response.status_code}: {response.text}", response.status_code)
+            for record in iter_json_array(response.iter_content(STREAM_CHUNK_BYTES)):
+                yield Enbox.from_dict(record)
+
+    def export_enboxes(self, export_format, f):
+        """Stream list_enboxes into f as CSV, JSONL or Parquet and return the record count
+
+        Records go from the response straight into the file a batch at a
+        time, so memory stays flat however large the inventory is.
+        """
+        from .export import write_export
+        return write_export(self.iter_enboxes(), export_format, f)
+
+    def create_enbox(self, payload, key=None):
+        """Create a managed Enbox from a create_enbox payload"""
+        return self.call("create_enbox", payload, key=key if key is not None else payload.get("email"))
+
+    def activate_enbox(self, email):
+        """Activate a managed Enbox"""
+        return self.call("activate_enbox", {"email": email}, key=email)
+
+    def deactivate_enbox(self, email):
+        """Deactivate a managed Enbox"""
+        return self.call("deactivate_enbox", {"email": email}, key=email)
+
+    def send_email(self, email_data, key=None):
+        """Send an email via the send-email endpoint"""
+        started = time.perf_counter()
+        response, error = self.post_email(email_data)
+        return to_result("send_email", response, error, time.perf_counter() - started, key)
+
+def to_result(action, response, error, elapsed, key=None):
+    """Convert a (response, error) pair into an ApiResult"""
+    if error:
+        return ApiResult(action, False, error=error, elapsed=elapsed, key=key)
+    try:
+        data = response.json()
+    except ValueError:
+        data = response.text
+    return ApiResult(action, response.status_code in (200, 201), status=response.status_code, data=data,
+                     elapsed=elapsed, key=key)
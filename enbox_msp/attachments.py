@@ -0,0 +1,156 @@
+"""Content-addressed attachment store and streaming send-email bodies
+
+Attachments are base64-encoded once, chunk by chunk, into a file named by the
+SHA-256 of their content, so the same report attached to every message of a
+campaign is hashed and encoded a single time. Payloads carry small
+references ({"filename", "content_type", "size", "sha256"}) instead of file
+contents; these are safe to queue in the outbox. At send time StreamingBody
+splices the encoded files into the JSON body through a memory map, so memory
+use stays near one chunk however large the attachments are.
+"""
+import base64
+import hashlib
+import json
+import mimetypes
+import mmap
+import os
+import tempfile
+import threading
+
+DEFAULT_ATTACHMENT_DIR = os.path.join(".attachments", "store")
+# A multiple of 3 bytes, so each chunk encodes to base64 without padding
+ATTACHMENT_CHUNK_BYTES = 3 * 64 * 1024
+
+def attachment_dir():
+    """Attachment store directory, overridable with ENBOX_ATTACHMENT_DIR"""
+    return os.environ.get("ENBOX_ATTACHMENT_DIR", DEFAULT_ATTACHMENT_DIR)
+
+def _chunks(f):
+    """Yield a binary file's contents in ATTACHMENT_CHUNK_BYTES pieces, memory-mapped when possible"""
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # In-memory uploads have no file descriptor, and empty files cannot be mapped
+        while True:
+            chunk = f.read(ATTACHMENT_CHUNK_BYTES)
+            if not chunk:
+                return
+            # Keep chunks whole even if the stream returns short reads, or the base64 would gain padding
+            while len(chunk) < ATTACHMENT_CHUNK_BYTES:
+                more = f.read(ATTACHMENT_CHUNK_BYTES - len(chunk))
+                if not more:
+                    break
+                chunk += more
+            yield chunk
+    else:
+        with mapped:
+            for offset in range(0, len(mapped), ATTACHMENT_CHUNK_BYTES):
+                yield mapped[offset:offset + ATTACHMENT_CHUNK_BYTES]
+
+class AttachmentStore:
+    """Directory of base64-encoded attachments keyed by content hash, safe to share across threads"""
+
+    def __init__(self, path=None):
+        self.path = path or attachment_dir()
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        # (path, size, mtime) -> sha256, so a file attached again is not even re-hashed
+        self._known_files = {}
+
+    def encoded_path(self, sha256):
+        return os.path.join(self.path, f"{sha256}.b64")
+
+    def add(self, f, filename, content_type=None):
+        """Hash and encode a binary file object in one streaming pass; return its reference"""
+        hasher = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as encoded:
+                for chunk in _chunks(f):
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    encoded.write(base64.b64encode(chunk))
+            sha256 = hasher.hexdigest()
+            target = self.encoded_path(sha256)
+            if os.path.exists(target):
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, target)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return {
+            "filename": filename,
+            "content_type": content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            "size": size,
+            "sha256": sha256,
+        }
+
+    def add_file(self, path, filename=None, content_type=None):
+        """Add a file from disk, reusing the previous encoding if it has not changed"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        filename = filename or os.path.basename(path)
+        with self._lock:
+            sha256 = self._known_files.get(key)
+        if sha256 and os.path.exists(self.encoded_path(sha256)):
+            return {
+                "filename": filename,
+                "content_type": content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                "size": stat.st_size,
+                "sha256": sha256,
+            }
+        with open(path, "rb") as f:
+            reference = self.add(f, filename, content_type)
+        with self._lock:
+            self._known_files[key] = reference["sha256"]
+        return reference
+
+    def body(self, payload):
+        """Streaming request body for a send_email payload with attachment references"""
+        return StreamingBody(payload, self)
+
+def _encoded_size(size):
+    return 4 * ((size + 2) // 3)
+
+class StreamingBody:
+    """JSON send_email body that streams attachment contents from the store
+
+    Iterable any number of times, so transport retries resend the whole
+    body, and sized, so the request carries a Content-Length.
+    """
+
+    def __init__(self, payload, store):
+        self.store = store
+        self.attachments = payload.get("attachments") or []
+        for reference in self.attachments:
+            if not os.path.exists(store.encoded_path(reference["sha256"])):
+                raise FileNotFoundError(f"Attachment {reference['filename']} is no longer in the attachment store")
+        head = json.dumps({key: value for key, value in payload.items() if key != "attachments"})
+        # Reopen the object to append the attachments array
+        self._head = (head[:-1] + (", " if len(head) > 2 else "") + '"attachments": [').encode()
+        self._parts = []
+        for reference in self.attachments:
+            meta = json.dumps({"filename": reference["filename"], "content_type": reference["content_type"]})
+            self._parts.append((meta[:-1] + ', "content": "').encode())
+        self._length = len(self._head) + len(b"]}") + sum(
+            len(part) + _encoded_size(reference["size"]) + len(b'"}')
+            for part, reference in zip(self._parts, self.attachments)
+        ) + len(b", ") * max(0, len(self.attachments) - 1)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        yield self._head
+        for number, (part, reference) in enumerate(zip(self._parts, self.attachments)):
+            if number:
+                yield b", "
+            yield part
+            with open(self.store.encoded_path(reference["sha256"]), "rb") as encoded:
+                # The store already holds base64, so these chunks are sent as-is
+                yield from _chunks(encoded)
+            yield b'"}'
+        yield b"]}"
@@ -0,0 +1,400 @@
+"""Command line interface for the MSP API and send-email endpoint
+
+    python -m enbox_msp list
+    python -m enbox_msp list --all-tenants
+    python -m enbox_msp export --format parquet -o enboxes.parquet
+    python -m enbox_msp create customer@example.com "Customer" --method invite
+    python -m enbox_msp deactivate a@example.com b@example.com
+    python -m enbox_msp send --to "a@enbox, b@enbox" --subject Hi --text "Hello"
+    python -m enbox_msp send --to "$(cat list.txt)" --subject Hi --text "Hello" --spread-minutes 60 --plan
+    python -m enbox_msp bulk-deactivate emails.txt --concurrency 64
+    cat payloads.jsonl | python -m enbox_msp bulk-send -
+
+Credentials come from ENBOX_MSP_API_KEY / ENBOX_ACCESS_TOKEN or a secrets file
+(see enbox_msp.credentials). Every result is written to stdout as one JSON
+line as soon as it is known. The exit status is 0 when every call succeeded,
+1 when any failed and 2 for usage or configuration errors. HTTP and asyncio
+libraries are imported only by the commands that need them.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+from dataclasses import replace
+from datetime import datetime, timezone
+
+from .api import CREATE_METHODS, ApiError, build_create_payload, parse_enbox_csv, validate_enbox_fields
+from .attachments import AttachmentStore
+from .credentials import load_credentials, load_tenants
+from .export import EXPORT_FORMATS
+from .htmlbody import HtmlPipeline
+from .recipients import DEFAULT_MAX_RECIPIENTS, batch_recipients, parse_recipients
+from .schedule import DEFAULT_MAX_PER_MINUTE, plan_schedule
+from .streaming import NotAnArray
+from .tenants import fetch_inventories
+
+DEFAULT_BULK_CONCURRENCY = 32
+
+class UsageError(Exception):
+    """Bad input or configuration; reported on stderr with exit status 2"""
+
+def emit(record):
+    """Write one JSON line and flush so consumers see it immediately"""
+    sys.stdout.write(json.dumps(record, default=str) + "\n")
+    sys.stdout.flush()
+
+def result_record(result):
+    """Flatten an ApiResult into an output record"""
+    record = {
+        "action": result.action,
+        "key": result.key,
+        "ok": result.ok,
+        "status": result.status,
+        "elapsed_ms": round(result.elapsed * 1000, 1),
+    }
+    if result.ok:
+        record["data"] = result.data
+    else:
+        record["error"] = result.detail
+    return record
+
+def open_input(path):
+    """Open a text input file, with '-' meaning stdin (which is left open on exit)"""
+    return contextlib.nullcontext(sys.stdin) if path == "-" else open(path, encoding="utf-8-sig")
+
+def read_numbered_lines(path):
+    """Yield (line number, line) for the non-blank lines of an input file, lazily"""
+    with open_input(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield line_no, line.strip()
+
+def read_lines(path):
+    """Yield the non-blank lines of an input file, lazily"""
+    for _, line in read_numbered_lines(path):
+        yield line
+
+def parse_send_payload(line):
+    """Parse one bulk-send line into a send_email payload, raising ValueError if it cannot be sent"""
+    try:
+        payload = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    if not payload.get("to") or not payload.get("subject"):
+        raise ValueError("to and subject are required")
+    return payload
+
+def client_for(credentials, need_api_key=False, need_access_token=False):
+    if need_api_key and not credentials.api_key:
+        raise UsageError("API key not configured: set ENBOX_MSP_API_KEY or [msp] api_key in the secrets file")
+    if need_access_token and not credentials.access_token:
+        raise UsageError("Access token not configured: set ENBOX_ACCESS_TOKEN or [enbox] access_token in the secrets file")
+    from .api import MSPClient
+    return MSPClient(credentials.api_key, credentials.access_token, credentials.api_url, credentials.send_email_url)
+
+def select_tenant(credentials, args):
+    """Credentials with the API key and URL of the tenant named by --tenant"""
+    tenants = {tenant.name: tenant for tenant in load_tenants(args.secrets, credentials)}
+    if args.tenant not in tenants:
+        raise UsageError(f"Unknown tenant {args.tenant!r}; configured: {', '.join(tenants) or 'none'}")
+    tenant = tenants[args.tenant]
+    return replace(credentials, api_key=tenant.api_key, api_url=tenant.api_url)
+
+def run_fan_out(credentials, concurrency, fan_out):
+    """Run fan_out(client, on_result) on an AsyncMSPClient, emitting each result as it completes"""
+    import asyncio
+
+    from .aio import AsyncMSPClient
+
+    failures = 0
+
+    def on_result(result):
+        nonlocal failures
+        failures += not result.ok
+        emit(result_record(result))
+
+    async def run():
+        async with AsyncMSPClient(credentials.api_key, credentials.access_token, credentials.api_url,
+                                  credentials.send_email_url, concurrency=concurrency) as client:
+            await fan_out(client, on_result)
+
+    asyncio.run(run())
+    return failures
+
+def cmd_list(credentials, args):
+    if args.all_tenants:
+        return list_all_tenants(credentials, args)
+    client = client_for(credentials, need_api_key=True)
+    try:
+        # Records are written as they are parsed, so memory stays flat on any inventory size
+        for enbox in client.iter_enboxes():
+            emit(enbox.to_dict())
+    except ApiError as e:
+        emit({"action": "list_enboxes", "ok": False, "status": e.status, "error": str(e)})
+        return 1
+    except NotAnArray as e:
+        emit(e.value)
+    return 0
+
+def cmd_export(credentials, args):
+    client = client_for(credentials, need_api_key=True)
+    try:
+        if args.output in (None, "-"):
+            client.export_enboxes(args.format, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+            return 0
+        # Written beside the target and renamed, so a failed export never leaves a truncated file
+        partial = args.output + ".part"
+        try:
+            with open(partial, "wb") as f:
+                count = client.export_enboxes(args.format, f)
+            os.replace(partial, args.output)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+    except ApiError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    emit({"action": "export", "format": args.format, "records": count, "path": args.output})
+    return 0
+
+def list_all_tenants(credentials, args):
+    """List every configured tenant concurrently, tagging each record with its tenant"""
+    from .api import MSPClient
+
+    tenants = load_tenants(args.secrets, credentials)
+    if not tenants:
+        raise UsageError("No tenants configured: add [msp] api_key or [tenants.<name>] tables to the secrets file")
+    lock = threading.Lock()
+
+    def fetch(tenant):
+        # Records are written as they arrive rather than collected, so memory stays flat
+        for enbox in MSPClient(tenant.api_key, api_url=tenant.api_url).iter_enboxes():
+            record = enbox.to_dict()
+            record["tenant"] = tenant.name
+            with lock:
+                emit(record)
+        return []
+
+    failures = 0
+    for inventory in fetch_inventories(tenants, fetch):
+        if not inventory.ok:
+            failures += 1
+            with lock:
+                emit({"action": "list_enboxes", "tenant": inventory.tenant.name, "ok": False,
+                      "elapsed_ms": round(inventory.elapsed * 1000, 1), "error": inventory.error})
+    return 1 if failures else 0
+
+def cmd_create(credentials, args):
+    password = args.password or os.environ.get("ENBOX_PASSWORD", "")
+    errors = validate_enbox_fields(args.email, args.display_name, args.method, password)
+    if errors:
+        raise UsageError("; ".join(errors))
+    client = client_for(credentials, need_api_key=True)
+    result = client.create_enbox(build_create_payload(args.email, args.display_name, args.method, password))
+    emit(result_record(result))
+    return 0 if result.ok else 1
+
+def cmd_set_status(credentials, args):
+    client = client_for(credentials, need_api_key=True)
+    failures = 0
+    for email in args.emails:
+        result = client.activate_enbox(email) if args.activate else client.deactivate_enbox(email)
+        failures += not result.ok
+        emit(result_record(result))
+    return 1 if failures else 0
+
+def build_send_payloads(args):
+    """Build one send_email payload per recipient batch"""
+    recipients = parse_recipients("\n".join(args.to), "\n".join(args.cc), "\n".join(args.bcc))
+    if recipients.invalid:
+        raise UsageError(f"Invalid email address(es): {', '.join(recipients.invalid)}")
+    if not recipients.to:
+        raise UsageError("At least one recipient is required")
+    if not args.text and not args.html:
+        raise UsageError("A --text or --html body is required")
+
+    email_payload = {
+        "subject": args.subject,
+        "send_via": args.send_via,
+        "read_receipt_requested": args.read_receipt,
+    }
+    if args.text:
+        email_payload["body_text"] = args.text
+    if args.html:
+        email_payload["body_html"] = args.html
+    if args.scheduled_at:
+        email_payload["scheduled_at"] = args.scheduled_at
+    if args.html and not args.raw_html:
+        email_payload = HtmlPipeline().prepare_payload(email_payload)
+    if args.attach:
+        store = AttachmentStore()
+        try:
+            email_payload["attachments"] = [store.add_file(path) for path in args.attach]
+        except OSError as e:
+            raise UsageError(f"Cannot attach {e.filename}: {e.strerror}")
+    try:
+        batches = batch_recipients(recipients, args.max_recipients)
+    except ValueError as e:
+        raise UsageError(str(e))
+    payloads = [
+        {**email_payload, **{name: addresses for name, addresses in batch.items() if addresses}}
+        for batch in batches
+    ]
+    if args.spread_minutes:
+        spread_payloads(payloads, args)
+    return payloads
+
+def spread_payloads(payloads, args):
+    """Give each payload a staggered scheduled_at, starting at --scheduled-at or now"""
+    if args.scheduled_at:
+        try:
+            start = datetime.fromisoformat(args.scheduled_at.replace("Z", "+00:00"))
+        except ValueError:
+            raise UsageError(f"--scheduled-at is not an ISO 8601 time: {args.scheduled_at}")
+    else:
+        start = datetime.now(timezone.utc).replace(microsecond=0)
+    plan = plan_schedule(len(payloads), start, args.spread_minutes, args.max_per_minute)
+    for number, payload in enumerate(payloads):
+        payload["scheduled_at"] = plan.scheduled_at(number)
+
+def cmd_send(credentials, args):
+    payloads = build_send_payloads(args)
+    if args.plan:
+        for number, payload in enumerate(payloads, 1):
+            emit({"message": number, "recipients": sum(len(payload.get(name, ())) for name in ("to", "cc", "bcc")),
+                  "scheduled_at": payload.get("scheduled_at")})
+        return 0
+    client = client_for(credentials, need_access_token=True)
+    if len(payloads) > 1:
+        failures = run_fan_out(credentials, args.concurrency, lambda aio, on_result: aio.send_many(payloads, on_result))
+        return 1 if failures else 0
+    result = client.send_email(payloads[0])
+    emit(result_record(result))
+    return 0 if result.ok else 1
+
+def cmd_bulk_create(credentials, args):
+    client_for(credentials, need_api_key=True)
+    with open_input(args.file) as f:
+        rows = parse_enbox_csv(f.read().encode("utf-8"))
+    failures = 0
+    payloads = []
+    for row in rows:
+        if row["errors"]:
+            failures += 1
+            emit({"action": "create_enbox", "key": row["email"], "ok": False, "row": row["row"],
+                  "error": "; ".join(row["errors"])})
+        else:
+            payloads.append(build_create_payload(row["email"], row["display_name"], row["method"], row["password"]))
+    failures += run_fan_out(credentials, args.concurrency, lambda client, on_result: client.create_many(payloads, on_result))
+    return 1 if failures else 0
+
+def cmd_bulk_set_status(credentials, args):
+    client_for(credentials, need_api_key=True)
+    emails = read_lines(args.file)
+    failures = run_fan_out(credentials, args.concurrency,
+                           lambda client, on_result: client.set_status_many(emails, args.activate, on_result))
+    return 1 if failures else 0
+
+def cmd_bulk_send(credentials, args):
+    client_for(credentials, need_access_token=True)
+    invalid = 0
+
+    def payloads():
+        # Each line is checked before it is dispatched; a bad line is reported and skipped
+        nonlocal invalid
+        for line_no, line in read_numbered_lines(args.file):
+            try:
+                yield line_no, parse_send_payload(line)
+            except ValueError as e:
+                invalid += 1
+                emit({"action": "send_email", "key": line_no, "ok": False, "error": str(e)})
+
+    def fan_out(client, on_result):
+        # Results are keyed by input line number, since they arrive in completion order
+        async def send_email(item):
+            line_no, payload = item
+            return await client.send_email(payload, key=line_no)
+
+        return client.map(send_email, payloads(), on_result, key=lambda item: item[0])
+
+    failures = run_fan_out(credentials, args.concurrency, fan_out)
+    return 1 if failures or invalid else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m enbox_msp", description="Manage Enboxes and send email from scripts")
+    parser.add_argument("--secrets", help="Secrets TOML file (default $ENBOX_SECRETS_FILE or .streamlit/secrets.toml)")
+    parser.add_argument("--tenant", help="Use the API key of this [tenants.<name>] table")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_command = commands.add_parser("list", help="List Enboxes, one JSON object per line")
+    list_command.add_argument("--all-tenants", action="store_true",
+                              help="List every configured tenant concurrently, adding a tenant field to each record")
+    list_command.set_defaults(func=cmd_list)
+
+    export = commands.add_parser("export", help="Export the inventory as CSV, JSONL or Parquet")
+    export.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    export.add_argument("-o", "--output", help="Output file (default stdout)")
+    export.set_defaults(func=cmd_export)
+
+    create = commands.add_parser("create", help="Create one Enbox")
+    create.add_argument("email")
+    create.add_argument("display_name")
+    create.add_argument("--method", choices=CREATE_METHODS, default="invite", help="Creation method (default invite)")
+    create.add_argument("--password", help="Password for direct creation (or set ENBOX_PASSWORD)")
+    create.set_defaults(func=cmd_create)
+
+    for name, activate in (("activate", True), ("deactivate", False)):
+        command = commands.add_parser(name, help=f"{name.title()} one or more Enboxes")
+        command.add_argument("emails", nargs="+")
+        command.set_defaults(func=cmd_set_status, activate=activate)
+
+    send = commands.add_parser("send", help="Send an email, split into batches under the recipient cap")
+    send.add_argument("--to", action="append", required=True, help="Recipients separated by commas, semicolons or new lines; repeatable")
+    send.add_argument("--cc", action="append", default=[])
+    send.add_argument("--bcc", action="append", default=[])
+    send.add_argument("--subject", required=True)
+    send.add_argument("--text", help="Plain text body")
+    send.add_argument("--html", help="HTML body")
+    send.add_argument("--raw-html", action="store_true",
+                      help="Send --html as given instead of inlining CSS, minifying and deriving a --text body")
+    send.add_argument("--send-via", choices=["enbox", "smtp"], default="enbox")
+    send.add_argument("--scheduled-at", help="ISO 8601 delivery time")
+    send.add_argument("--read-receipt", action="store_true")
+    send.add_argument("--attach", action="append", default=[], metavar="FILE", help="Attach a file; repeatable")
+    send.add_argument("--max-recipients", type=int, default=DEFAULT_MAX_RECIPIENTS, help="Recipients per message")
+    send.add_argument("--concurrency", type=int, default=DEFAULT_BULK_CONCURRENCY, help="Batches sent in parallel")
+    send.add_argument("--spread-minutes", type=float, help="Stagger the batches' scheduled_at across this many minutes")
+    send.add_argument("--max-per-minute", type=float, default=DEFAULT_MAX_PER_MINUTE,
+                      help=f"Cap on scheduled messages per minute when spreading (default {DEFAULT_MAX_PER_MINUTE})")
+    send.add_argument("--plan", action="store_true", help="Print the batches and their scheduled_at without sending")
+    send.set_defaults(func=cmd_send)
+
+    bulk = {
+        "bulk-create": ("Create Enboxes from a CSV (email, display_name, method, password)", cmd_bulk_create, {}),
+        "bulk-activate": ("Activate the Enboxes listed one per line", cmd_bulk_set_status, {"activate": True}),
+        "bulk-deactivate": ("Deactivate the Enboxes listed one per line", cmd_bulk_set_status, {"activate": False}),
+        "bulk-send": ("Send one email per line of JSON send_email payloads; results are keyed by line number",
+                      cmd_bulk_send, {}),
+    }
+    for name, (help_text, func, defaults) in bulk.items():
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("file", help="Input file, or - for stdin")
+        command.add_argument("--concurrency", type=int, default=DEFAULT_BULK_CONCURRENCY, help="Requests in flight")
+        command.set_defaults(func=func, **defaults)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        credentials = load_credentials(args.secrets)
+        if args.tenant:
+            credentials = select_tenant(credentials, args)
+        return args.func(credentials, args)
+    except (UsageError, OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
@@ -0,0 +1,19 @@
+"""Endpoint and HTTP client defaults"""
+import os
+
+# API Configuration
+DEFAULT_API_BASE_URL = "https://cmwvwqbrnxgofinkeevm.supabase.co/functions/v1/msp-api"
+DEFAULT_SEND_EMAIL_URL = "https://cmwvwqbrnxgofinkeevm.supabase.co/functions/v1/send-email"
+
+# HTTP client configuration
+CONNECT_TIMEOUT_SECONDS = 3.05
+READ_TIMEOUT_SECONDS = 30
+CONNECTION_POOL_SIZE = 32
+
+def api_base_url():
+    """MSP API URL, overridable with ENBOX_MSP_API_URL (e.g. to target a local stand-in)"""
+    return os.environ.get("ENBOX_MSP_API_URL", DEFAULT_API_BASE_URL)
+
+def send_email_url():
+    """Send-email URL, overridable with ENBOX_SEND_EMAIL_URL"""
+    return os.environ.get("ENBOX_SEND_EMAIL_URL", DEFAULT_SEND_EMAIL_URL)
@@ -0,0 +1,59 @@
+"""Credentials and endpoints for scripts, read from the environment or a secrets file
+
+The file uses the same layout as .streamlit/secrets.toml ([msp] api_key and
+api_url, [enbox] access_token and send_email_url), so the app and scripts can
+share one file, including any [tenants.<name>] tables. Environment variables
+take precedence over the file.
+"""
+import os
+import tomllib
+from dataclasses import dataclass
+from typing import Optional
+
+from . import config
+from .tenants import tenants_from_secrets
+
+DEFAULT_SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+@dataclass(frozen=True)
+class Credentials:
+    api_key: Optional[str]
+    access_token: Optional[str]
+    api_url: str
+    send_email_url: str
+
+def secrets_path():
+    """Secrets file path, overridable with ENBOX_SECRETS_FILE"""
+    return os.environ.get("ENBOX_SECRETS_FILE", DEFAULT_SECRETS_PATH)
+
+def load_secrets(path=None):
+    """Parse the secrets file; an explicitly given path must exist, the default path is optional"""
+    if path or os.path.exists(secrets_path()):
+        with open(path or secrets_path(), "rb") as f:
+            return tomllib.load(f)
+    return {}
+
+def credentials_from_secrets(secrets):
+    """Resolve credentials from ENBOX_MSP_API_KEY / ENBOX_ACCESS_TOKEN, then a parsed secrets mapping"""
+    msp = secrets.get("msp") or {}
+    enbox = secrets.get("enbox") or {}
+    return Credentials(
+        api_key=os.environ.get("ENBOX_MSP_API_KEY") or msp.get("api_key"),
+        access_token=os.environ.get("ENBOX_ACCESS_TOKEN") or enbox.get("access_token"),
+        api_url=os.environ.get("ENBOX_MSP_API_URL") or msp.get("api_url") or config.DEFAULT_API_BASE_URL,
+        send_email_url=os.environ.get("ENBOX_SEND_EMAIL_URL") or enbox.get("send_email_url") or config.DEFAULT_SEND_EMAIL_URL,
+    )
+
+def load_credentials(path=None):
+    """Resolve credentials from the environment, then the secrets file"""
+    return credentials_from_secrets(load_secrets(path))
+
+def resolve_tenants(secrets, credentials):
+    """Resolve the tenants in a parsed secrets mapping; the default tenant uses the resolved credentials"""
+    # The environment's API key overrides the file's for the default tenant too
+    secrets = {**secrets, "msp": {**(secrets.get("msp") or {}), "api_key": credentials.api_key}}
+    return tenants_from_secrets(secrets, credentials.api_url)
+
+def load_tenants(path=None, credentials=None):
+    """Resolve the configured tenants from the secrets file"""
+    return resolve_tenants(load_secrets(path), credentials or load_credentials(path))
@@ -0,0 +1,117 @@
+"""Streaming inventory export to CSV, JSON Lines and Parquet
+
+Every format is a generator pipeline: Enboxes go in (a cached list or the
+live iter_enboxes stream) and byte chunks come out one batch of records at a
+time, so an export of any size holds at most one batch in memory. CSV and
+Parquet carry the fixed EXPORT_COLUMNS; JSON Lines carries each record's
+full to_dict(), including fields the model does not know about.
+"""
+import csv
+import io
+import json
+
+EXPORT_COLUMNS = ["id", "email", "display_name", "status", "create_via", "created_at"]
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Records per chunk, and per row group in Parquet
+EXPORT_BATCH_RECORDS = 10_000
+
+def _batches(enboxes, size):
+    batch = []
+    for enbox in enboxes:
+        batch.append(enbox)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _row(enbox):
+    return (enbox.id, enbox.email, enbox.display_name, enbox.status, enbox.method, enbox.created_at)
+
+def iter_csv(enboxes, batch_records=EXPORT_BATCH_RECORDS):
+    """Yield a CSV export as UTF-8 byte chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _batches(enboxes, batch_records):
+        writer.writerows(_row(enbox) for enbox in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # An empty inventory still gets its header
+        yield buffer.getvalue().encode("utf-8")
+
+def iter_jsonl(enboxes, batch_records=EXPORT_BATCH_RECORDS):
+    """Yield a JSON Lines export, one to_dict() record per line"""
+    for batch in _batches(enboxes, batch_records):
+        yield "".join(json.dumps(enbox.to_dict()) + "\n" for enbox in batch).encode("utf-8")
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects what the Parquet writer produces until it is drained"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _text(value):
+    return value if value is None or isinstance(value, str) else str(value)
+
+def iter_parquet(enboxes, batch_records=EXPORT_BATCH_RECORDS):
+    """Yield a Parquet export, one row group per batch, as the writer produces it"""
+    # pyarrow ships with Streamlit but is a heavy import for the CSV and JSONL paths
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in _batches(enboxes, batch_records):
+            columns = zip(*(_row(enbox) for enbox in batch))
+            writer.write_table(pa.table([pa.array(map(_text, values), pa.string()) for values in columns], schema=schema))
+            yield sink.drain()
+    # The footer is written on close
+    yield sink.drain()
+
+_EXPORTERS = {"csv": iter_csv, "jsonl": iter_jsonl, "parquet": iter_parquet}
+
+def export_chunks(enboxes, export_format):
+    """Yield an export of enboxes in export_format ("csv", "jsonl" or "parquet") as byte chunks"""
+    if export_format not in _EXPORTERS:
+        raise ValueError(f"Unknown export format {export_format!r}; choose from {', '.join(_EXPORTERS)}")
+    return _EXPORTERS[export_format](enboxes)
+
+def write_export(enboxes, export_format, f):
+    """Stream an export into a binary file and return the number of records written"""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for enbox in enboxes:
+            count += 1
+            yield enbox
+
+    for chunk in export_chunks(counted(), export_format):
+        f.write(chunk)
+    return count
@@ -0,0 +1,413 @@
+"""HTML email body processing: CSS inlining, minification and plain-text derivation
+
+Many mail clients ignore <style> blocks, so simple rules (tag, .class, #id
+and combinations such as p.note) are copied into each matching element's
+style attribute; rules that cannot be inlined, such as @media queries and
+pseudo-classes, stay in a <style> block, with @media declarations marked
+!important so they still override the inlined styles. The markup is then
+minified, and a plain-text alternative is derived for messages that have
+none.
+
+Processing is pure, so HtmlPipeline caches results in an LRU keyed by the
+SHA-256 of the source: a template sent thousands of times is processed once.
+{{placeholders}} pass through unchanged, so campaign templates can be
+processed before they are rendered.
+"""
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+DEFAULT_CACHE_ENTRIES = 256
+
+# Elements around which whitespace never renders
+BLOCK_TAGS = frozenset((
+    "address", "article", "aside", "blockquote", "body", "br", "center", "dd", "div", "dl", "dt",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "head", "header", "hr", "html", "li",
+    "link", "meta", "nav", "ol", "p", "section", "style", "table", "tbody", "td", "tfoot", "th",
+    "thead", "title", "tr", "ul",
+))
+# Elements whose content is kept byte for byte
+PREFORMATTED_TAGS = frozenset(("pre", "textarea"))
+RAW_TEXT_TAGS = frozenset(("script", "style"))
+VOID_TAGS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"))
+# Never given inline styles, and skipped when deriving text
+NON_VISUAL_TAGS = frozenset(("base", "head", "link", "meta", "script", "style", "title"))
+
+_WHITESPACE = re.compile(r"[ \t\n\r\f]+")
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_SIMPLE_SELECTOR = re.compile(r"^([a-z][a-z0-9]*)?((?:[#.][A-Za-z_-][A-Za-z0-9_-]*)*)$")
+_SELECTOR_PART = re.compile(r"[#.][A-Za-z_-][A-Za-z0-9_-]*")
+
+def minify_css(css):
+    """Drop comments and the whitespace CSS does not need"""
+    css = _WHITESPACE.sub(" ", _CSS_COMMENT.sub("", css)).strip()
+    css = re.sub(r" ?([{};:,>]) ?", r"\1", css)
+    return css.replace(";}", "}").rstrip(";")
+
+def _split_rules(css):
+    """Yield (prelude, body) for each top-level CSS rule; at-rules come back whole with body None"""
+    depth = 0
+    start = 0
+    prelude = None
+    for pos, char in enumerate(css):
+        if char == "{":
+            if depth == 0:
+                prelude = css[start:pos].strip()
+                start = pos + 1
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                if prelude.startswith("@"):
+                    yield f"{prelude}{{{css[start:pos]}}}", None
+                else:
+                    yield prelude, css[start:pos]
+                start = pos + 1
+        elif char == ";" and depth == 0 and css[start:pos].strip().startswith("@"):
+            # Block-less at-rules such as @import
+            yield css[start:pos + 1].strip(), None
+            start = pos + 1
+
+def _parse_declarations(body):
+    declarations = []
+    for declaration in body.split(";"):
+        name, _, value = declaration.partition(":")
+        name, value = name.strip().lower(), value.strip()
+        if name and value:
+            declarations.append((name, value))
+    return declarations
+
+class _Rule:
+    __slots__ = ("tag", "id", "classes", "specificity", "declarations")
+
+    def __init__(self, selector, declarations, order):
+        match = _SIMPLE_SELECTOR.match(selector)
+        self.tag = match.group(1)
+        parts = _SELECTOR_PART.findall(match.group(2))
+        ids = [part[1:] for part in parts if part[0] == "#"]
+        self.id = ids[0] if len(ids) == 1 else None
+        self.classes = frozenset(part[1:] for part in parts if part[0] == ".")
+        self.specificity = (len(ids), len(self.classes), 1 if self.tag else 0, order)
+        self.declarations = declarations
+
+    def matches(self, tag, element_id, classes):
+        return ((self.tag is None or self.tag == tag)
+                and (self.id is None or self.id == element_id)
+                and self.classes <= classes)
+
+def _important(body):
+    return ";".join(
+        f"{name}:{value}" if value.lower().replace(" ", "").endswith("!important") else f"{name}:{value} !important"
+        for name, value in _parse_declarations(body)
+    )
+
+def _media_overrides(at_rule):
+    """Mark every declaration in an @media block !important
+
+    Inlined base rules become style attributes, which beat any stylesheet
+    rule, so responsive overrides only apply if they are !important.
+    """
+    prelude, _, rest = at_rule.partition("{")
+    rules = []
+    for selector, body in _split_rules(rest[:-1]):
+        rules.append(selector if body is None else f"{selector}{{{_important(body)}}}")
+    return f"{prelude}{{{''.join(rules)}}}"
+
+def parse_stylesheet(css):
+    """Split CSS into inlinable rules and the residual CSS that has to stay in a <style> block"""
+    rules = []
+    residual = []
+    for prelude, body in _split_rules(_CSS_COMMENT.sub("", css)):
+        if body is None:
+            residual.append(_media_overrides(prelude) if prelude.lower().startswith("@media") else prelude)
+            continue
+        declarations = _parse_declarations(body)
+        kept = []
+        for selector in (part.strip() for part in prelude.split(",")):
+            if selector and _SIMPLE_SELECTOR.match(selector):
+                rules.append(_Rule(selector, declarations, len(rules)))
+            else:
+                kept.append(selector)
+        if kept:
+            residual.append(f"{','.join(kept)}{{{body}}}")
+    return rules, minify_css("".join(residual))
+
+class _Tokenizer(HTMLParser):
+    """Flatten a document into (kind, value, attrs) tokens, keeping raw text for what is not rewritten"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tokens = []
+
+    def handle_starttag(self, tag, attrs):
+        self.tokens.append(("start", tag, attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.tokens.append(("start", tag, attrs))
+
+    def handle_endtag(self, tag):
+        self.tokens.append(("end", tag, None))
+
+    def handle_data(self, data):
+        self.tokens.append(("text", data, None))
+
+    def handle_comment(self, data):
+        self.tokens.append(("comment", data, None))
+
+    def handle_decl(self, decl):
+        self.tokens.append(("raw", f"<!{decl}>", None))
+
+    def handle_pi(self, data):
+        self.tokens.append(("raw", f"<?{data}>", None))
+
+    def unknown_decl(self, data):
+        self.tokens.append(("raw", f"<![{data}]>", None))
+
+def _tokenize(source):
+    tokenizer = _Tokenizer()
+    tokenizer.feed(source)
+    tokenizer.close()
+    return tokenizer.tokens
+
+def _is_conditional_comment(data):
+    # Outlook's <!--[if mso]> ... <![endif]--> blocks carry real markup
+    return data.lstrip().startswith("[if") or data.rstrip().endswith("<![endif]")
+
+def _start_tag(tag, attrs):
+    rendered = [tag]
+    for name, value in attrs:
+        rendered.append(name if value is None else f'{name}="{html.escape(value, quote=True)}"')
+    return f"<{' '.join(rendered)}>"
+
+def _drop_empty_styles(tokens):
+    skip_until = None
+    for number, token in enumerate(tokens):
+        if skip_until is not None:
+            if token == ("end", "style", None):
+                skip_until = None
+            continue
+        if token[:2] == ("start", "style"):
+            body = tokens[number + 1] if number + 1 < len(tokens) else None
+            if body is None or body[0] != "text" or not body[1].strip():
+                skip_until = "style"
+                continue
+        yield token
+
+def inline_css(tokens):
+    """Move inlinable <style> rules into style attributes, in place, and return the tokens"""
+    rules = []
+    in_style = False
+    for number, (kind, value, attrs) in enumerate(tokens):
+        if kind == "start" and value == "style":
+            in_style = True
+        elif kind == "end" and value == "style":
+            in_style = False
+        elif in_style and kind == "text":
+            found, residual = parse_stylesheet(value)
+            for rule in found:
+                # Later blocks win over earlier ones at equal specificity
+                rule.specificity = rule.specificity[:3] + (len(rules),)
+                rules.append(rule)
+            tokens[number] = ("text", residual, None)
+    if not rules:
+        return tokens
+    rules.sort(key=lambda rule: rule.specificity)
+    tokens[:] = _drop_empty_styles(tokens)
+
+    for number, (kind, tag, attrs) in enumerate(tokens):
+        if kind != "start" or tag in NON_VISUAL_TAGS:
+            continue
+        attributes = dict(attrs)
+        classes = frozenset((attributes.get("class") or "").split())
+        matched = [rule for rule in rules if rule.matches(tag, attributes.get("id"), classes)]
+        if not matched:
+            continue
+        style = {}
+        for rule in matched:
+            style.update(rule.declarations)
+        # Declarations already in the style attribute win over the stylesheet
+        style.update(_parse_declarations(attributes.get("style") or ""))
+        attributes["style"] = ";".join(f"{name}:{value}" for name, value in style.items())
+        tokens[number] = ("start", tag, list(attributes.items()))
+    return tokens
+
+def _render(tokens, minify):
+    out = []
+    preformatted = 0
+    raw_text = None
+    for number, (kind, value, attrs) in enumerate(tokens):
+        if kind == "start":
+            out.append(_start_tag(value, attrs))
+            if value in PREFORMATTED_TAGS:
+                preformatted += 1
+            elif value in RAW_TEXT_TAGS:
+                raw_text = value
+        elif kind == "end":
+            out.append(f"</{value}>")
+            if value in PREFORMATTED_TAGS:
+                preformatted = max(0, preformatted - 1)
+            elif value == raw_text:
+                raw_text = None
+        elif kind == "text":
+            if raw_text:
+                # Script and style content is not HTML-escaped
+                out.append(minify_css(value) if minify and raw_text == "style" else value)
+            elif preformatted or not minify:
+                out.append(html.escape(value, quote=False))
+            else:
+                collapsed = _WHITESPACE.sub(" ", value)
+                if collapsed == " ":
+                    previous = tokens[number - 1] if number else None
+                    following = tokens[number + 1] if number + 1 < len(tokens) else None
+                    if (previous is None or following is None
+                            or (previous[0] in ("start", "end") and previous[1] in BLOCK_TAGS)
+                            or (following[0] in ("start", "end") and following[1] in BLOCK_TAGS)):
+                        continue
+                out.append(html.escape(collapsed, quote=False))
+        elif kind == "comment":
+            if not minify or _is_conditional_comment(value):
+                out.append(f"<!--{value}-->")
+        else:
+            out.append(value)
+    return "".join(out)
+
+def minify_html(source, inline=True):
+    """Minify an HTML document, first inlining its CSS unless inline=False"""
+    tokens = _tokenize(source)
+    if inline:
+        inline_css(tokens)
+    return _render(tokens, minify=True)
+
+class _TextExtractor(HTMLParser):
+    """Render the readable text of an HTML document the way a plain-text email would show it"""
+
+    # Tags that start a new paragraph, and those that only start a new line
+    PARAGRAPH_TAGS = frozenset(("blockquote", "h1", "h2", "h3", "h4", "h5", "h6", "ol", "p", "pre", "table", "ul"))
+    LINE_TAGS = frozenset(("address", "article", "aside", "center", "dd", "div", "dl", "dt", "footer",
+                           "form", "header", "nav", "section", "tr"))
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.hidden = 0
+        self.preformatted = 0
+        self.links = []
+
+    def newline(self, count=1):
+        self.parts.append("\n" * count)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in NON_VISUAL_TAGS:
+            if tag not in VOID_TAGS:
+                self.hidden += 1
+            return
+        attributes = dict(attrs)
+        if tag in self.PARAGRAPH_TAGS:
+            self.newline(2)
+        elif tag in self.LINE_TAGS:
+            self.newline()
+        elif tag == "br":
+            self.parts.append("\n")
+        elif tag == "hr":
+            self.newline(2)
+        elif tag == "li":
+            self.parts.append("\n- ")
+        elif tag in ("td", "th"):
+            self.parts.append(" ")
+        elif tag == "img" and attributes.get("alt"):
+            self.parts.append(attributes["alt"])
+        if tag == "pre":
+            self.preformatted += 1
+        if tag == "a":
+            self.links.append((attributes.get("href") or "", len(self.parts)))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in NON_VISUAL_TAGS:
+            if tag not in VOID_TAGS:
+                self.hidden = max(0, self.hidden - 1)
+            return
+        if tag in self.PARAGRAPH_TAGS:
+            self.newline(2)
+        elif tag in self.LINE_TAGS:
+            self.newline()
+        if tag == "pre":
+            self.preformatted = max(0, self.preformatted - 1)
+        if tag == "a" and self.links:
+            href, start = self.links.pop()
+            label = "".join(self.parts[start:]).strip()
+            if href and not href.startswith("#") and href.removeprefix("mailto:") != label:
+                self.parts.append(f" ({href.removeprefix('mailto:')})" if label else href)
+
+    def handle_data(self, data):
+        if self.hidden:
+            return
+        if self.preformatted:
+            self.parts.append(data.replace("\n", "\x00"))
+        else:
+            self.parts.append(_WHITESPACE.sub(" ", data))
+
+    def text(self):
+        lines = []
+        for line in "".join(self.parts).split("\n"):
+            lines.append(_WHITESPACE.sub(" ", line).strip() if "\x00" not in line else line.rstrip())
+        text = "\n".join(lines).replace("\x00", "\n")
+        return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def html_to_text(source):
+    """Derive a plain-text alternative from an HTML body"""
+    extractor = _TextExtractor()
+    extractor.feed(source)
+    extractor.close()
+    return extractor.text()
+
+@dataclass(frozen=True)
+class ProcessedHtml:
+    html: str
+    text: str
+
+class HtmlPipeline:
+    """LRU-cached HTML body processing keyed by content hash, safe to share across threads"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def process(self, source):
+        """Return the minified, CSS-inlined HTML and its derived text for source"""
+        key = hashlib.sha256(source.encode("utf-8")).digest()
+        with self._lock:
+            processed = self._cache.get(key)
+            if processed is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return processed
+            self.misses += 1
+        processed = ProcessedHtml(minify_html(source), html_to_text(source))
+        with self._lock:
+            self._cache[key] = processed
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return processed
+
+    def prepare_payload(self, payload):
+        """Return a copy of a send_email payload with body_html processed and body_text filled in if missing"""
+        if not (payload.get("body_html") or "").strip():
+            return payload
+        processed = self.process(payload["body_html"])
+        prepared = {**payload, "body_html": processed.html}
+        if not (payload.get("body_text") or "").strip():
+            prepared["body_text"] = processed.text
+        return prepared
@@ -0,0 +1,195 @@
+"""In-process request and render metrics with Prometheus text export
+
+All clients record into the module-level REGISTRY, so one process-wide view
+covers every Streamlit session, worker thread and event loop.
+"""
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # One extra slot for observations above the largest bucket (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation within its bucket, as histogram_quantile does"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if idx == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[idx - 1] if idx else 0.0
+                return lower + (self.buckets[idx] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+class MetricsRegistry:
+    """Thread-safe store of labelled histograms and counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, labels, value):
+        """Record a duration in the histogram for name and labels"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        """Increment the counter for name and labels"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def histograms(self, name):
+        """Return [(labels, histogram snapshot)] for a histogram name"""
+        with self._lock:
+            return [
+                (dict(labels), _snapshot(histogram))
+                for (metric, labels), histogram in self._histograms.items()
+                if metric == name
+            ]
+
+    def counters(self, name):
+        """Return [(labels, value)] for a counter name"""
+        with self._lock:
+            return [(dict(labels), value) for (metric, labels), value in self._counters.items() if metric == name]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def to_prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = sorted((key, _snapshot(histogram)) for key, histogram in self._histograms.items())
+            counters = sorted(self._counters.items())
+        
+        lines = []
+        last_name = None
+        for (name, labels), histogram in histograms:
+            if name != last_name:
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                last_name = name
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        for (name, labels), value in counters:
+            if name != last_name:
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                last_name = name
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+def _snapshot(histogram):
+    copy = Histogram(histogram.buckets)
+    copy.counts = histogram.counts[:]
+    copy.sum = histogram.sum
+    copy.count = histogram.count
+    return copy
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+# Metric names
+REQUEST_DURATION = "enbox_msp_request_duration_seconds"
+REQUEST_RETRIES = "enbox_msp_request_retries_total"
+REQUEST_ERRORS = "enbox_msp_request_errors_total"
+REQUEST_COALESCED = "enbox_msp_request_coalesced_total"
+RENDER_DURATION = "enbox_msp_render_duration_seconds"
+
+HELP = {
+    REQUEST_DURATION: "Upstream call duration including retries, by action and final status code",
+    REQUEST_RETRIES: "Upstream attempts that were retried, by action",
+    REQUEST_ERRORS: "Upstream calls that failed, by action and reason",
+    REQUEST_COALESCED: "Reads answered by another caller's in-flight or just-finished upstream call, by action",
+    RENDER_DURATION: "Streamlit script run duration, by section",
+}
+
+REGISTRY = MetricsRegistry()
+
+def record_request(action, status, seconds):
+    """Record one upstream call; status is the HTTP status code or 'error' if none was received"""
+    REGISTRY.observe(REQUEST_DURATION, {"action": action, "status": str(status)}, seconds)
+    if status == "error":
+        return
+    if int(status) >= 400:
+        REGISTRY.inc(REQUEST_ERRORS, {"action": action, "reason": f"http_{status}"})
+
+def record_error(action, error):
+    """Count an upstream call that raised instead of returning a response"""
+    REGISTRY.inc(REQUEST_ERRORS, {"action": action, "reason": type(error).__name__})
+
+def record_retry(action):
+    """Count one retried attempt"""
+    REGISTRY.inc(REQUEST_RETRIES, {"action": action})
+
+def record_coalesced(action):
+    """Count one call that shared another caller's upstream result"""
+    REGISTRY.inc(REQUEST_COALESCED, {"action": action})
+
+def record_render(section, seconds):
+    """Record one script run of a UI section"""
+    REGISTRY.observe(RENDER_DURATION, {"section": section}, seconds)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve REGISTRY at http://host:port/metrics from a background thread, once per port"""
+    with _servers_lock:
+        if port not in _servers:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+            _servers[port] = server
+        return _servers[port]
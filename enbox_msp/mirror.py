@@ -0,0 +1,205 @@
+"""Local SQLite mirror of the Enbox inventory with incremental refresh
+
+Each refresh diffs the upstream list_enboxes snapshot against the stored
+rows and writes only added, changed and removed records. Readers load from
+local disk and use the recorded refresh time to show how stale they are.
+Inventories from different API keys are kept apart by an account ID
+derived from the key; keys themselves are never stored.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .models import Enbox
+
+DEFAULT_MIRROR_PATH = os.path.join(".mirror", "inventory.sqlite3")
+DEFAULT_REFRESH_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enboxes (
+    account TEXT NOT NULL,
+    email TEXT NOT NULL,
+    status TEXT,
+    created_at TEXT,
+    record TEXT NOT NULL,
+    PRIMARY KEY (account, email)
+);
+CREATE TABLE IF NOT EXISTS refreshes (
+    account TEXT PRIMARY KEY,
+    refreshed_at REAL,
+    record_count INTEGER,
+    last_error TEXT,
+    last_error_at REAL
+);
+"""
+
+def mirror_path():
+    """Mirror database path, overridable with ENBOX_MIRROR_PATH"""
+    return os.environ.get("ENBOX_MIRROR_PATH", DEFAULT_MIRROR_PATH)
+
+def account_id(api_key):
+    """Stable, non-reversible ID for the account an API key belongs to"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+def _encode(record):
+    return json.dumps(record, sort_keys=True, separators=(",", ":"))
+
+class InventoryMirror:
+    """SQLite-backed copy of each account's inventory, safe to share across threads"""
+
+    def __init__(self, path=None):
+        self.path = path or mirror_path()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def load(self, account):
+        """Return (enboxes, refreshed_at) for an account; refreshed_at is None if never mirrored"""
+        with self._lock:
+            meta = self._db.execute("SELECT refreshed_at FROM refreshes WHERE account = ?", (account,)).fetchone()
+            if not meta or meta[0] is None:
+                return [], None
+            rows = self._db.execute(
+                "SELECT record FROM enboxes WHERE account = ? ORDER BY rowid", (account,)
+            ).fetchall()
+        return [Enbox.from_dict(json.loads(row[0])) for row in rows], meta[0]
+
+    def status(self, account):
+        """Return refresh metadata for an account as a dict, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT refreshed_at, record_count, last_error, last_error_at FROM refreshes WHERE account = ?",
+                (account,),
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(("refreshed_at", "record_count", "last_error", "last_error_at"), row))
+
+    def apply_snapshot(self, account, enboxes):
+        """Diff a full upstream snapshot of Enbox objects against the mirror and write only the deltas
+
+        Returns {"added": n, "changed": n, "removed": n}.
+        """
+        incoming = {}
+        for enbox in enboxes:
+            if enbox.email:
+                incoming[enbox.email] = enbox
+        
+        with self._lock:
+            stored = dict(self._db.execute("SELECT email, record FROM enboxes WHERE account = ?", (account,)))
+            upserts = []
+            added = changed = 0
+            for email, enbox in incoming.items():
+                encoded = _encode(enbox.to_dict())
+                previous = stored.get(email)
+                if previous == encoded:
+                    continue
+                if previous is None:
+                    added += 1
+                else:
+                    changed += 1
+                upserts.append((account, email, enbox.status, enbox.created_at, encoded))
+            removed = [(account, email) for email in stored.keys() - incoming.keys()]
+            
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT INTO enboxes (account, email, status, created_at, record) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (account, email) DO UPDATE SET status = excluded.status, "
+                    "created_at = excluded.created_at, record = excluded.record",
+                    upserts,
+                )
+                self._db.executemany("DELETE FROM enboxes WHERE account = ? AND email = ?", removed)
+                self._db.execute(
+                    "INSERT INTO refreshes (account, refreshed_at, record_count, last_error) VALUES (?, ?, ?, NULL) "
+                    "ON CONFLICT (account) DO UPDATE SET refreshed_at = excluded.refreshed_at, "
+                    "record_count = excluded.record_count, last_error = NULL",
+                    (account, time.time(), len(incoming)),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return {"added": added, "changed": changed, "removed": len(removed)}
+
+    def patch(self, account, email, **fields):
+        """Write a known change to one record through to the mirror"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT record FROM enboxes WHERE account = ? AND email = ?", (account, email)
+            ).fetchone()
+            if not row:
+                return False
+            record = {**json.loads(row[0]), **fields}
+            self._db.execute(
+                "UPDATE enboxes SET status = ?, created_at = ?, record = ? WHERE account = ? AND email = ?",
+                (record.get("status"), record.get("created_at"), _encode(record), account, email),
+            )
+            return True
+
+    def record_error(self, account, error):
+        """Remember why the last refresh failed, keeping the previous snapshot"""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO refreshes (account, last_error, last_error_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (account) DO UPDATE SET last_error = excluded.last_error, "
+                "last_error_at = excluded.last_error_at",
+                (account, error, time.time()),
+            )
+
+class MirrorRefresher(threading.Thread):
+    """Daemon thread that refreshes every registered account's mirror on an interval"""
+
+    def __init__(self, mirror, interval=DEFAULT_REFRESH_SECONDS):
+        super().__init__(name="inventory-mirror-refresher", daemon=True)
+        self.mirror = mirror
+        self.interval = interval
+        self._accounts = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def register(self, account, fetch, on_change=None):
+        """Refresh account with fetch() -> Enboxes; on_change(enboxes, changes) runs when deltas were applied"""
+        with self._lock:
+            is_new = account not in self._accounts
+            self._accounts[account] = (fetch, on_change)
+        if is_new:
+            self._wakeup.set()
+
+    def refresh(self, account):
+        """Refresh one account now and return its change counts"""
+        with self._lock:
+            fetch, on_change = self._accounts[account]
+        try:
+            records = fetch()
+        except Exception as e:
+            self.mirror.record_error(account, str(e) or type(e).__name__)
+            raise
+        changes = self.mirror.apply_snapshot(account, records)
+        if on_change and any(changes.values()):
+            on_change(records, changes)
+        return changes
+
+    def run(self):
+        while True:
+            with self._lock:
+                accounts = list(self._accounts)
+            for account in accounts:
+                status = self.mirror.status(account)
+                refreshed_at = status and status["refreshed_at"]
+                if refreshed_at and time.time() - refreshed_at < self.interval:
+                    continue
+                try:
+                    self.refresh(account)
+                except Exception:
+                    # Already recorded on the account; keep serving the previous snapshot
+                    pass
+            self._wakeup.wait(self.interval / 4)
+            self._wakeup.clear()
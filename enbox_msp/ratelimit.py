@@ -0,0 +1,197 @@
+"""Client-side rate limiting and adaptive concurrency per upstream endpoint
+
+Each endpoint (msp-api, send-email) gets one EndpointLimiter shared by every
+thread and event loop in the process: a token bucket caps the request rate,
+and an AIMD window caps requests in flight, halving on 429/5xx/timeouts and
+growing by roughly one slot per window of successes. Retry-After pauses the
+whole endpoint, not just the request that received it.
+
+Request rates are unlimited unless set through ENBOX_RATE_LIMITS
+("msp-api=50:100,send-email=20" as name=rate[:burst]) or configure();
+the concurrency window adapts either way.
+"""
+import asyncio
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# Per-endpoint defaults, e.g. {"send-email": {"rate": 20, "burst": 40}}
+DEFAULT_LIMITS = {}
+DEFAULT_INITIAL_CONCURRENCY = 16
+DEFAULT_MAX_CONCURRENCY = 64
+DECREASE_FACTOR = 0.5
+# Failures within this long of a decrease count as the same congestion event
+DECREASE_COOLDOWN_SECONDS = 1.0
+MAX_RETRY_AFTER_SECONDS = 300
+
+class TokenBucket:
+    """Token bucket that hands out reservations, so callers can sleep without holding a lock"""
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, rate or 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take one token and return how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if not self.rate:
+                return wait
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def pause(self, seconds):
+        """Hold every reservation for at least seconds from now"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class AdaptiveConcurrency:
+    """AIMD limit on requests in flight"""
+
+    def __init__(self, initial=DEFAULT_INITIAL_CONCURRENCY, minimum=1, maximum=DEFAULT_MAX_CONCURRENCY):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def try_acquire(self):
+        """Take a slot if one is free"""
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """Block until a slot is free, then take it"""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, congested):
+        """Return a slot and adapt the limit to the outcome of its request"""
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if congested:
+                if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+                    self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+class EndpointLimiter:
+    """Rate and concurrency limiter for one upstream endpoint"""
+
+    def __init__(self, name, rate=None, burst=None, initial_concurrency=DEFAULT_INITIAL_CONCURRENCY,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, maximum=max_concurrency)
+        self.throttled = 0
+
+    def acquire(self):
+        """Wait for a token and a concurrency slot (threads)"""
+        wait = self.bucket.reserve()
+        if wait:
+            time.sleep(wait)
+        self.concurrency.acquire()
+
+    async def acquire_async(self):
+        """Wait for a token and a concurrency slot without blocking the event loop"""
+        wait = self.bucket.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        # The slot is shared with threads, so poll rather than await a loop-bound primitive
+        delay = 0.001
+        while not self.concurrency.try_acquire():
+            await asyncio.sleep(delay)
+            delay = min(0.05, delay * 2)
+
+    def release(self, status=None, retry_after=None, error=False):
+        """Report a request's outcome: its HTTP status, Retry-After seconds, or a transport error"""
+        congested = error or status == 429 or (status is not None and status >= 500)
+        if status == 429:
+            self.throttled += 1
+        if retry_after:
+            self.bucket.pause(retry_after)
+        self.concurrency.release(congested)
+
+    def snapshot(self):
+        """Current settings and state, for diagnostics"""
+        return {
+            "endpoint": self.name,
+            "rate_per_sec": self.bucket.rate,
+            "burst": self.bucket.burst if self.bucket.rate else None,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "throttled": self.throttled,
+        }
+
+def parse_retry_after(value):
+    """Return Retry-After (delta-seconds or HTTP-date) as seconds, or None"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), MAX_RETRY_AFTER_SECONDS)
+
+def endpoint_name(url):
+    """Name an endpoint by the last segment of its URL path, e.g. 'msp-api'"""
+    parts = urlsplit(url)
+    return parts.path.rstrip("/").rpartition("/")[2] or parts.netloc
+
+def _env_limits():
+    limits = {}
+    for item in os.environ.get("ENBOX_RATE_LIMITS", "").split(","):
+        name, _, spec = item.partition("=")
+        if not spec:
+            continue
+        rate, _, burst = spec.partition(":")
+        limits[name.strip()] = {"rate": float(rate), "burst": float(burst) if burst else None}
+    return limits
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(url):
+    """Return the process-wide limiter for the endpoint a URL points at"""
+    name = endpoint_name(url)
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            options = {**DEFAULT_LIMITS.get(name, {}), **_env_limits().get(name, {})}
+            limiter = _limiters[name] = EndpointLimiter(name, **options)
+        return limiter
+
+def configure(name, **options):
+    """Replace an endpoint's limiter with new settings (rate, burst, initial/max_concurrency)"""
+    with _limiters_lock:
+        _limiters[name] = EndpointLimiter(name, **{**DEFAULT_LIMITS.get(name, {}), **options})
+        return _limiters[name]
+
+def snapshots():
+    """Snapshot every limiter created so far"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.snapshot() for limiter in limiters]
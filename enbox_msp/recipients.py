@@ -0,0 +1,101 @@
+"""Recipient parsing, validation and batching for send_email
+
+Pasted distribution lists may separate addresses with commas, semicolons or
+newlines and repeat addresses across To, CC and BCC. Addresses are lower-cased,
+deduplicated (To wins over CC, CC over BCC), syntax-checked and split into
+batches that each stay under the per-message recipient cap.
+"""
+import math
+import re
+from dataclasses import dataclass, field
+from itertools import chain, islice
+
+DEFAULT_MAX_RECIPIENTS = 50
+FIELDS = ("to", "cc", "bcc")
+
+SEPARATORS = re.compile(r"[,;\r\n]+")
+# "Name <address>" keeps only the address
+ANGLE_ADDRESS = re.compile(r"<([^<>]*)>\s*$")
+# Deliberately loose: one @, no spaces, a dot-separated domain of letters, digits and hyphens
+ADDRESS_PATTERN = re.compile(
+    r"[a-z0-9!#$%&'*+/=?^_`{|}~.-]+@[a-z0-9](?:[a-z0-9-]*[a-z0-9])?(?:\.[a-z0-9](?:[a-z0-9-]*[a-z0-9])?)*"
+)
+
+@dataclass
+class Recipients:
+    """Normalized, deduplicated recipients and what was dropped on the way"""
+    to: list = field(default_factory=list)
+    cc: list = field(default_factory=list)
+    bcc: list = field(default_factory=list)
+    invalid: list = field(default_factory=list)
+    duplicates: int = 0
+
+    @property
+    def total(self):
+        return len(self.to) + len(self.cc) + len(self.bcc)
+
+def normalize_address(raw):
+    """Strip a display name and whitespace from one address and lower-case it"""
+    raw = raw.strip()
+    match = ANGLE_ADDRESS.search(raw)
+    if match:
+        raw = match.group(1).strip()
+    return raw.lower()
+
+def parse_recipients(to="", cc="", bcc=""):
+    """Parse To/CC/BCC text into a Recipients"""
+    recipients = Recipients()
+    seen = set()
+    for name, text in zip(FIELDS, (to, cc, bcc)):
+        addresses = getattr(recipients, name)
+        for raw in SEPARATORS.split(text or ""):
+            address = normalize_address(raw)
+            if not address:
+                continue
+            if address in seen:
+                recipients.duplicates += 1
+            elif ADDRESS_PATTERN.fullmatch(address):
+                seen.add(address)
+                addresses.append(address)
+            else:
+                recipients.invalid.append(raw.strip())
+    return recipients
+
+def batch_recipients(recipients, max_recipients=DEFAULT_MAX_RECIPIENTS):
+    """Split recipients into {"to", "cc", "bcc"} batches of at most max_recipients
+
+    Every batch needs a To address. When there are at least as many To
+    addresses as batches they are spread evenly and CC and then BCC fill
+    the remaining room. Otherwise, as with one To and a long BCC list, the
+    whole To list is repeated in every batch and only CC and BCC are split,
+    so To addresses receive one copy per batch. Raises ValueError if the
+    To list is too long to repeat.
+    """
+    max_recipients = max(1, int(max_recipients))
+    count = max(1, math.ceil(recipients.total / max_recipients))
+    repeat_to = len(recipients.to) < count
+    if repeat_to:
+        room = max_recipients - len(recipients.to)
+        if room < 1:
+            raise ValueError(
+                f"{len(recipients.to)} To addresses leave no room for CC/BCC under the cap of {max_recipients} "
+                "recipients per message; move some To addresses to CC or BCC"
+            )
+        count = max(1, math.ceil((len(recipients.cc) + len(recipients.bcc)) / room))
+    else:
+        base, extra = divmod(len(recipients.to), count)
+    rest = chain((("cc", address) for address in recipients.cc), (("bcc", address) for address in recipients.bcc))
+    batches = []
+    start = 0
+    for number in range(count):
+        if repeat_to:
+            to = list(recipients.to)
+        else:
+            size = base + (number < extra)
+            to = recipients.to[start:start + size]
+            start += size
+        batch = {"to": to, "cc": [], "bcc": []}
+        for name, address in islice(rest, max_recipients - len(to)):
+            batch[name].append(address)
+        batches.append(batch)
+    return batches
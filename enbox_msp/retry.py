@@ -0,0 +1,17 @@
+"""Retry policy shared by the sync and async clients"""
+import random
+
+MAX_RETRIES = 3
+RETRY_BACKOFF_BASE_SECONDS = 0.5
+RETRY_BACKOFF_MAX_SECONDS = 8
+RETRY_STATUS_CODES = {502, 503, 504}
+# The upstream rejected the request before processing it, so any action may be retried
+THROTTLED_STATUS_CODE = 429
+
+# Actions that are safe to repeat if the first attempt's outcome is unknown
+IDEMPOTENT_ACTIONS = {"list_enboxes", "activate_enbox", "deactivate_enbox"}
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff delay before retrying after the given attempt"""
+    ceiling = min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
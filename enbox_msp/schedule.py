@@ -0,0 +1,81 @@
+"""Load-smoothing delivery schedules for large sends
+
+Thousands of messages sent within the same minute arrive upstream as one
+spike and get throttled. A SendPlan instead spaces them evenly across a
+target window, never faster than a maximum rate, and each message carries
+its slot as `scheduled_at` so the upstream delivers them pre-spread.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+DEFAULT_WINDOW_MINUTES = 60
+DEFAULT_MAX_PER_MINUTE = 100
+
+def format_scheduled_at(moment):
+    """ISO 8601 UTC timestamp as the send-email endpoint expects it, e.g. 2026-10-17T09:30:00Z
+
+    Naive datetimes are taken to be UTC.
+    """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def scheduled_at_from_inputs(date, time):
+    """scheduled_at for a date and a time of day in UTC, as picked in the UI"""
+    return format_scheduled_at(datetime.combine(date, time, tzinfo=timezone.utc))
+
+@dataclass
+class SendPlan:
+    """Delivery slots for a run of messages, one per message in order"""
+    start: datetime
+    window_end: datetime
+    # Seconds between consecutive messages
+    interval: float
+    times: List[datetime] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def end(self):
+        """Slot of the last message"""
+        return self.times[-1] if self.times else self.start
+
+    @property
+    def overruns(self):
+        """True when the rate cap pushes the last message past the window"""
+        return self.end > self.window_end
+
+    @property
+    def per_minute(self):
+        """Effective send rate"""
+        return 60 / self.interval if self.interval else float(len(self.times))
+
+    def scheduled_at(self, number):
+        """Formatted scheduled_at of the message at position number"""
+        return format_scheduled_at(self.times[number])
+
+    def per_minute_counts(self):
+        """{minute: messages} for previewing how the load is spread"""
+        counts = {}
+        for moment in self.times:
+            minute = moment.replace(second=0, microsecond=0)
+            counts[minute] = counts.get(minute, 0) + 1
+        return counts
+
+def plan_schedule(count, start, window_minutes=DEFAULT_WINDOW_MINUTES, max_per_minute=DEFAULT_MAX_PER_MINUTE):
+    """Spread count messages evenly from start across the window, no faster than max_per_minute
+
+    The first message is scheduled at start. If the window is too short for
+    the rate, the plan keeps the rate and runs past the window; check
+    SendPlan.overruns before submitting it.
+    """
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    window = timedelta(minutes=window_minutes)
+    interval = window.total_seconds() / count if count else 0.0
+    if max_per_minute:
+        interval = max(interval, 60 / max_per_minute)
+    times = [start + timedelta(seconds=number * interval) for number in range(count)]
+    return SendPlan(start, start + window, interval, times)
@@ -0,0 +1,77 @@
+"""In-memory search index over an Enbox inventory
+
+Text search matches query terms against token prefixes of each record's
+email and display name (the whole value, plus its words, local part and
+domain labels) and of the full domain, with and without its "@". Status, domain and creation method are indexed as sets of
+record positions, so filters are set intersections instead of scans.
+Build once per inventory snapshot and query as often as needed.
+"""
+import bisect
+import re
+import sys
+from collections import defaultdict
+
+from .models import STATUS_UNKNOWN
+
+TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+
+def tokens_for(enbox):
+    """Searchable tokens for one Enbox"""
+    email = (enbox.email or "").lower()
+    name = (enbox.display_name or "").lower()
+    tokens = {email, name}
+    tokens.update(TOKEN_SPLIT.split(email))
+    tokens.update(TOKEN_SPLIT.split(name))
+    # Customers are looked up by domain, typed as "globex.example" or "@globex"
+    if enbox.domain:
+        tokens.update((enbox.domain, "@" + enbox.domain))
+    tokens.discard("")
+    return tokens
+
+class EnboxIndex:
+    """Prefix index on email/display_name plus set indexes on status, domain and method"""
+
+    def __init__(self, enboxes):
+        self.size = len(enboxes)
+        self.status = defaultdict(set)
+        self.domain = defaultdict(set)
+        self.method = defaultdict(set)
+        postings = []
+        for position, enbox in enumerate(enboxes):
+            self.status[enbox.status].add(position)
+            self.domain[enbox.domain].add(position)
+            self.method[enbox.method or STATUS_UNKNOWN].add(position)
+            # Interning shares the many repeated tokens such as domain labels
+            postings.extend((sys.intern(token), position) for token in tokens_for(enbox))
+        postings.sort()
+        self._tokens = [token for token, _ in postings]
+        self._positions = [position for _, position in postings]
+
+    def update_status(self, position, old_status, new_status):
+        """Move a record between status sets after a write-through patch"""
+        self.status[old_status].discard(position)
+        self.status[new_status].add(position)
+
+    def prefix(self, term):
+        """Positions of records with a token starting with term"""
+        start = bisect.bisect_left(self._tokens, term)
+        # Every string with this prefix sorts below term + the highest code point
+        end = bisect.bisect_left(self._tokens, term + "\U0010ffff", start)
+        return set(self._positions[start:end])
+
+    def search(self, text="", statuses=(), domains=(), methods=()):
+        """Return matching record positions in inventory order, or None if nothing narrows the set"""
+        candidates = None
+        for index, values in ((self.status, statuses), (self.domain, domains), (self.method, methods)):
+            if values:
+                matches = set().union(*(index.get(value, ()) for value in values))
+                candidates = matches if candidates is None else candidates & matches
+
+        # Try the most selective (longest) terms first so the set shrinks fastest
+        for term in sorted(text.lower().split(), key=len, reverse=True):
+            matches = self.prefix(term)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                break
+
+        return None if candidates is None else sorted(candidates)
@@ -0,0 +1,121 @@
+"""Process-wide coalescing of identical in-flight calls
+
+When many sessions ask for the same read at once (shift start, repeated
+Refresh clicks), only the first caller goes upstream; the others wait for
+and share its result. A result also answers callers that arrive within a
+short window after it finished, which absorbs bursts of reruns without
+letting data go noticeably stale. Failures (any Exception) are shared with
+the callers that were already waiting but never reused after that. A
+BaseException such as a Streamlit rerun belongs to the caller it was raised
+in: it is never shared, and a waiting caller takes over the call instead.
+"""
+import threading
+import time
+
+from . import metrics
+
+DEFAULT_COALESCE_SECONDS = 0.25
+
+class _Call:
+    __slots__ = ("done", "changed", "result", "error", "abandoned", "finished_at", "progress", "version")
+
+    def __init__(self):
+        self.done = threading.Event()
+        # Notified on every progress report and when the call finishes
+        self.changed = threading.Condition()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+        self.finished_at = None
+        self.progress = None
+        self.version = 0
+
+class SingleFlight:
+    """Run func once per key among concurrent callers, safe to share across threads"""
+
+    def __init__(self, window=DEFAULT_COALESCE_SECONDS):
+        self.window = window
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, action="request"):
+        """Return func()'s result, sharing an in-flight or just-finished call for the same key
+
+        `action` labels the coalesced-call counter in the metrics registry.
+        """
+        while True:
+            call, leader = self._join(key, action)
+            if leader:
+                self._run(key, call, func)
+            else:
+                call.done.wait()
+            if not call.abandoned:
+                return self._outcome(call)
+
+    def do_with_progress(self, key, func, on_progress=None, action="request"):
+        """Like do(), for a func(report) that calls report(value) as it makes progress
+
+        func runs on a thread of its own, never in a caller's thread, and
+        every caller, the leader included, gets on_progress(value) in its own
+        thread as values are reported. Whatever on_progress raises leaves
+        only that caller; the call carries on for everyone else.
+        """
+        while True:
+            call, leader = self._join(key, action)
+            if leader:
+                def report(value):
+                    with call.changed:
+                        call.progress = value
+                        call.version += 1
+                        call.changed.notify_all()
+
+                threading.Thread(target=self._run, args=(key, call, func, report), daemon=True,
+                                 name=f"single-flight-{action}").start()
+            seen = 0
+            while True:
+                with call.changed:
+                    while call.version == seen and not call.done.is_set():
+                        call.changed.wait()
+                    seen, progress, done = call.version, call.progress, call.done.is_set()
+                if on_progress and seen and not done:
+                    on_progress(progress)
+                if done:
+                    break
+            if not call.abandoned:
+                return self._outcome(call)
+
+    def _join(self, key, action):
+        """Return the call for key and whether this caller leads it"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None or (call.done.is_set() and time.monotonic() - call.finished_at > self.window)
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            metrics.record_coalesced(action)
+        return call, leader
+
+    def _run(self, key, call, func, *args):
+        """Run func, keeping an Exception on the call and re-raising anything else"""
+        try:
+            call.result = func(*args)
+        except Exception as e:
+            call.error = e
+        except BaseException:
+            call.abandoned = True
+            raise
+        finally:
+            call.finished_at = time.monotonic()
+            if call.error is not None or call.abandoned:
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+            with call.changed:
+                call.done.set()
+                call.changed.notify_all()
+
+    @staticmethod
+    def _outcome(call):
+        if call.error is not None:
+            raise call.error
+        return call.result
@@ -0,0 +1,219 @@
+"""Durable SQLite outbox for outgoing email and the background worker that delivers it
+
+Delivery is at-least-once: a message whose send timed out after reaching the
+upstream is retried, so it may in rare cases arrive twice.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_SPOOL_PATH = os.path.join(".spool", "outbox.sqlite3")
+SPOOL_MAX_ATTEMPTS = 8
+SPOOL_BACKOFF_BASE_SECONDS = 2
+SPOOL_BACKOFF_MAX_SECONDS = 300
+SPOOL_POLL_SECONDS = 2.0
+SPOOL_WORKER_CONCURRENCY = 4
+
+QUEUED = "queued"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    last_error TEXT,
+    response TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+def spool_path():
+    """Spool database path, overridable with ENBOX_SPOOL_PATH"""
+    return os.environ.get("ENBOX_SPOOL_PATH", DEFAULT_SPOOL_PATH)
+
+def retry_delay(attempts):
+    """Full-jitter exponential delay before the next delivery attempt"""
+    ceiling = min(SPOOL_BACKOFF_MAX_SECONDS, SPOOL_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+class EmailSpool:
+    """SQLite-backed queue of send-email payloads, safe to share across threads"""
+
+    def __init__(self, path=None):
+        self.path = path or spool_path()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # Messages claimed by a worker that died mid-send go back in the queue
+        with self._lock:
+            self._db.execute("UPDATE outbox SET status = ? WHERE status = ?", (QUEUED, SENDING))
+
+    def enqueue(self, payload, not_before=None):
+        """Store a payload for delivery and return its message ID"""
+        message_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO outbox (id, payload, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (message_id, json.dumps(payload), QUEUED, not_before or now, now, now),
+            )
+        return message_id
+
+    def enqueue_many(self, payloads, not_before=None):
+        """Store several payloads in one transaction and return their message IDs"""
+        now = time.time()
+        rows = [(uuid.uuid4().hex[:12], json.dumps(payload), QUEUED, not_before or now, now, now) for payload in payloads]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT INTO outbox (id, payload, status, next_attempt_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [row[0] for row in rows]
+
+    def claim_due(self, limit):
+        """Atomically move up to limit due messages to 'sending' and return them"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT id, payload, attempts FROM outbox WHERE status = ? AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at LIMIT ?",
+                    (QUEUED, now, limit),
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE outbox SET status = ?, updated_at = ? WHERE id = ?",
+                    [(SENDING, now, row["id"]) for row in rows],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [(row["id"], json.loads(row["payload"]), row["attempts"]) for row in rows]
+
+    def mark_sent(self, message_id, response_text):
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ?, response = ?, "
+                "last_error = NULL WHERE id = ?",
+                (SENT, time.time(), response_text, message_id),
+            )
+
+    def mark_failed(self, message_id, error, retry_in=None):
+        """Record a failed attempt; requeue after retry_in seconds, or fail permanently if None"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt_at = ?, updated_at = ?, "
+                "last_error = ? WHERE id = ?",
+                (QUEUED if retry_in is not None else FAILED, now + (retry_in or 0), now, error, message_id),
+            )
+
+    def retry_failed(self):
+        """Requeue every permanently failed message for immediate delivery"""
+        now = time.time()
+        with self._lock:
+            return self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ? WHERE status = ?",
+                (QUEUED, now, now, FAILED),
+            ).rowcount
+
+    def get(self, message_id):
+        """Return one message as a dict, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM outbox WHERE id = ?", (message_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, limit=50):
+        """Return the most recently created messages as dicts"""
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM outbox ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self):
+        """Return {status: count}"""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+class SpoolWorker(threading.Thread):
+    """Daemon thread that delivers due spool messages with retry and backoff
+
+    send(payload) must return a requests-style response or raise on
+    transport errors. 429 and 5xx responses and transport errors are
+    retried; any other 4xx fails the message permanently.
+    """
+
+    def __init__(self, spool, send, concurrency=SPOOL_WORKER_CONCURRENCY,
+                 max_attempts=SPOOL_MAX_ATTEMPTS, poll_seconds=SPOOL_POLL_SECONDS):
+        super().__init__(name="email-spool-worker", daemon=True)
+        self.spool = spool
+        self.send = send
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def wake(self):
+        """Skip the rest of the poll interval, e.g. right after an enqueue"""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="email-spool-send") as pool:
+            while not self._stopping.is_set():
+                batch = self.spool.claim_due(self.concurrency)
+                if batch:
+                    list(pool.map(self.deliver, batch))
+                    continue
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+
+    def deliver(self, message):
+        """Attempt one message and record the outcome"""
+        message_id, payload, attempts = message
+        attempt = attempts + 1
+        try:
+            response = self.send(payload)
+        except Exception as e:
+            return self._retry_or_fail(message_id, attempt, str(e) or type(e).__name__)
+        
+        if response.status_code in (200, 201):
+            self.spool.mark_sent(message_id, response.text)
+        elif response.status_code == 429 or response.status_code >= 500:
+            self._retry_or_fail(message_id, attempt, f"Error {response.status_code}: {response.text}")
+        else:
+            self.spool.mark_failed(message_id, f"Error {response.status_code}: {response.text}")
+
+    def _retry_or_fail(self, message_id, attempt, error):
+        retry_in = retry_delay(attempt) if attempt < self.max_attempts else None
+        self.spool.mark_failed(message_id, error, retry_in)
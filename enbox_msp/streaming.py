@@ -0,0 +1,93 @@
+"""Incremental parsing of large JSON array responses
+
+list_enboxes returns one JSON array of records. Parsing it as it downloads
+means the first records are usable after the first chunk, and the raw body is
+never held in memory next to the parsed list.
+"""
+import codecs
+import json
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_END = _WHITESPACE + ",]"
+
+class NotAnArray(ValueError):
+    """The body was valid JSON but not an array; the parsed value is in .value"""
+
+    def __init__(self, value):
+        super().__init__("expected a JSON array")
+        self.value = value
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def iter_json_array(chunks):
+    """Yield the elements of a top-level JSON array from an iterable of byte or text chunks
+
+    Raises NotAnArray if the body is some other JSON value and ValueError if
+    it is not valid JSON.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    finished = False
+
+    def fill():
+        # Drop what has been consumed and append the next chunk; False once the body is exhausted
+        nonlocal buffer, pos, finished
+        for chunk in chunks:
+            text = utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                buffer = buffer[pos:] + text
+                pos = 0
+                return True
+        buffer = buffer[pos:] + utf8.decode(b"", final=True)
+        pos = 0
+        finished = True
+        return False
+
+    def next_char():
+        # Skip whitespace and return the next significant character, reading more as needed
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if finished or not fill():
+                return ""
+
+    first = next_char()
+    if first != "[":
+        while fill():
+            pass
+        raise NotAnArray(json.loads(buffer[pos:]))
+    pos += 1
+
+    if next_char() == "]":
+        return
+    while True:
+        next_char()
+        try:
+            value, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The element continues in the next chunk
+            if finished or not fill():
+                raise
+            continue
+        if not finished and (end == len(buffer) or (_is_number(value) and buffer[end] not in _NUMBER_END)):
+            # A bare number may be cut short by the chunk boundary; decode it again with more input
+            fill()
+            continue
+        pos = end
+        yield value
+
+        delimiter = next_char()
+        if delimiter == "]":
+            return
+        if delimiter != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {delimiter!r}")
+        pos += 1
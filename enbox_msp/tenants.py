@@ -0,0 +1,77 @@
+"""Several MSP accounts (tenants) managed from one app or script
+
+Tenants are configured next to the default account in the secrets file:
+
+    [msp]
+    api_key = "msp_main_key"
+
+    [tenants.acme]
+    api_key = "msp_acme_key"
+    api_url = "https://..."   # optional, defaults to the [msp] URL
+
+The [msp] account, if it has a key, is the tenant named "default".
+fetch_inventories lists every tenant concurrently; each one is timed and its
+failure is recorded on its own result, so a slow or broken tenant never
+hides the others.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+DEFAULT_TENANT = "default"
+MAX_TENANT_WORKERS = 16
+
+@dataclass(frozen=True)
+class Tenant:
+    name: str
+    api_key: str
+    api_url: str
+
+@dataclass
+class TenantInventory:
+    """Outcome of listing one tenant's Enboxes"""
+    tenant: Tenant
+    enboxes: List = field(default_factory=list)
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+def tenants_from_secrets(secrets, api_url):
+    """Build the configured tenants from a parsed secrets mapping
+
+    api_url is the default account's resolved URL, used by tenants that do
+    not set their own.
+    """
+    tenants = []
+    default_key = (secrets.get("msp") or {}).get("api_key")
+    if default_key:
+        tenants.append(Tenant(DEFAULT_TENANT, default_key, api_url))
+    for name, options in (secrets.get("tenants") or {}).items():
+        if options.get("api_key") and name != DEFAULT_TENANT:
+            tenants.append(Tenant(name, options["api_key"], options.get("api_url") or api_url))
+    return tenants
+
+def fetch_inventories(tenants, fetch, max_workers=MAX_TENANT_WORKERS):
+    """Call fetch(tenant) for every tenant concurrently, yielding a TenantInventory as each finishes
+
+    fetch returns the tenant's Enboxes or raises; exceptions are captured
+    on that tenant's result.
+    """
+    def run(tenant):
+        started = time.perf_counter()
+        try:
+            enboxes = fetch(tenant)
+        except Exception as e:
+            return TenantInventory(tenant, error=str(e) or type(e).__name__, elapsed=time.perf_counter() - started)
+        return TenantInventory(tenant, enboxes, elapsed=time.perf_counter() - started)
+
+    if not tenants:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tenants)), thread_name_prefix="tenant-fetch") as pool:
+        futures = [pool.submit(run, tenant) for tenant in tenants]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,85 @@
+"""Pooled keep-alive HTTP transport for the synchronous request paths"""
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from . import metrics
+from .config import CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS, CONNECTION_POOL_SIZE
+from .ratelimit import get_limiter, parse_retry_after
+from .retry import MAX_RETRIES, RETRY_STATUS_CODES, THROTTLED_STATUS_CODE, backoff_delay
+
+class HttpClient:
+    """Keep-alive HTTP client with timeouts and jittered retry, safe to share across threads"""
+
+    def __init__(self, pool_size=CONNECTION_POOL_SIZE, max_retries=MAX_RETRIES,
+                 timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS)):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        # The cookie jar is the only state a Session mutates per request; refusing
+        # cookies keeps one Session safe to use from many script threads at once
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        # requests only offers gzip and deflate; urllib3 also decodes br and zstd, as the
+        # body streams, when brotli or zstandard is installed, and lists what it can decode
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post(self, url, headers, payload, retry=False, action="request", stream=False, body=None):
+        """POST JSON, retrying transient failures when the request is idempotent
+
+        Every attempt passes through the endpoint's shared rate limiter, and
+        the call is timed into the metrics registry under `action`. With
+        stream=True the body is left unread (and the timing stops at the
+        headers); the caller must consume or close the response. Pass a
+        pre-encoded, re-iterable `body` instead of `payload` to stream the
+        request itself.
+        """
+        attempts = self.max_retries + 1 if retry else 1
+        limiter = get_limiter(url)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            limiter.acquire()
+            try:
+                response = self.session.post(url, headers=headers, json=payload if body is None else None, data=body,
+                                             timeout=self.timeout, stream=stream)
+            except requests.exceptions.ConnectTimeout as e:
+                limiter.release(error=True)
+                # Nothing reached the server, so even non-idempotent requests may be retried
+                if attempt > self.max_retries:
+                    self._record_failure(action, e, started)
+                    raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                limiter.release(error=True)
+                if attempt >= attempts:
+                    self._record_failure(action, e, started)
+                    raise
+            except Exception as e:
+                # A bad URL, a body cut off mid-read or a missing attachment must still
+                # hand the slot back, or the shared window shrinks for good
+                limiter.release(error=True)
+                self._record_failure(action, e, started)
+                raise
+            else:
+                status = response.status_code
+                limiter.release(status, parse_retry_after(response.headers.get("Retry-After")))
+                throttled = status == THROTTLED_STATUS_CODE and attempt <= self.max_retries
+                if not throttled and (status not in RETRY_STATUS_CODES or attempt >= attempts):
+                    metrics.record_request(action, status, time.perf_counter() - started)
+                    return response
+                # Return the connection to the pool before retrying
+                response.close()
+            metrics.record_retry(action)
+            # Any Retry-After is enforced by the limiter before the next attempt
+            time.sleep(backoff_delay(attempt))
+
+    @staticmethod
+    def _record_failure(action, error, started):
+        metrics.record_request(action, "error", time.perf_counter() - started)
+        metrics.record_error(action, error)
@@ -1,7 +1,40 @@
 import streamlit as st
-import requests
+import pandas as pd
+import asyncio
+import csv
+import hashlib
+import html
+import io
 import json
-from datetime import datetime
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+from enbox_msp import metrics, ratelimit
+from enbox_msp.aio import AsyncMSPClient
+from enbox_msp.api import CREATE_METHODS, ApiError, MSPClient, build_create_payload, parse_enbox_csv, validate_enbox_fields
+from enbox_msp.attachments import AttachmentStore
+from enbox_msp.credentials import credentials_from_secrets, resolve_tenants
+from enbox_msp.export import EXPORT_FORMATS, write_export
+from enbox_msp.htmlbody import HtmlPipeline
+from enbox_msp.mirror import DEFAULT_REFRESH_SECONDS, InventoryMirror, MirrorRefresher, account_id, mirror_path
+from enbox_msp.models import STATUS_ACTIVE, STATUS_INACTIVE, Enbox
+from enbox_msp.recipients import DEFAULT_MAX_RECIPIENTS, batch_recipients, parse_recipients
+from enbox_msp.schedule import DEFAULT_MAX_PER_MINUTE, DEFAULT_WINDOW_MINUTES, plan_schedule, scheduled_at_from_inputs
+from enbox_msp.search import EnboxIndex
+from enbox_msp.singleflight import DEFAULT_COALESCE_SECONDS, SingleFlight
+from enbox_msp.spool import SPOOL_WORKER_CONCURRENCY, EmailSpool, SpoolWorker, spool_path
+from enbox_msp.streaming import STREAM_CHUNK_BYTES, NotAnArray, iter_json_array
+from enbox_msp.tenants import fetch_inventories
+from enbox_msp.transport import HttpClient
+
+# Script start, for per-rerun timing in the diagnostics section
+SCRIPT_STARTED = time.perf_counter()
 
 # Page configuration
 st.set_page_config(
@@ -24,18 +57,6 @@ st.markdown("""
         color: #666;
         margin-bottom: 1.5rem;
     }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 2px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        padding: 10px 20px;
-        background-color: #f0f2f6;
-        border-radius: 4px 4px 0 0;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: white;
-        border-bottom: 2px solid #1f77b4;
-    }
     </style>
 """, unsafe_allow_html=True)
 
@@ -43,260 +64,1419 @@ st.markdown("""
 st.markdown('<div class="main-header">MSP Control Center</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-header">Manage your customer Enboxes and API access</div>', unsafe_allow_html=True)
 
-# API Configuration
-API_BASE_URL = "https://cmwvwqbrnxgofinkeevm.supabase.co/functions/v1/msp-api"
-SEND_EMAIL_URL = "https://cmwvwqbrnxgofinkeevm.supabase.co/functions/v1/send-email"
+@st.cache_resource
+def apply_rate_limits(settings):
+    """Configure the per-endpoint limiters from secrets, once per distinct setting"""
+    for endpoint, options in json.loads(settings).items():
+        ratelimit.configure(endpoint, **options)
 
-def get_api_key():
-    """Get API key from Streamlit secrets"""
+def configure_rate_limits():
+    """Apply [rate_limits.<endpoint>] tables from Streamlit secrets, if any"""
     try:
-        return st.secrets["msp"]["api_key"]
-    except Exception as e:
-        st.error("⚠️ MSP API key not found in secrets. Please configure it in .streamlit/secrets.toml")
-        st.code("""
-# Add this to .streamlit/secrets.toml:
-[msp]
-api_key = "msp_your_key_here"
-        """, language="toml")
+        settings = {endpoint: dict(options) for endpoint, options in st.secrets["rate_limits"].items()}
+    except Exception:
+        return
+    apply_rate_limits(json.dumps(settings, sort_keys=True))
+
+@st.cache_resource
+def get_http_client():
+    """Get the HTTP client shared across reruns and sessions"""
+    return HttpClient()
+
+@st.cache_resource
+def get_attachment_store():
+    """Get the attachment store shared across reruns, sessions and the outbox worker"""
+    return AttachmentStore()
+
+@st.cache_resource
+def get_html_pipeline():
+    """Get the HTML body processor whose cache is shared across reruns and sessions"""
+    return HtmlPipeline()
+
+def add_attachments(uploaded_files):
+    """Hash and encode uploaded files into the attachment store and return their references
+
+    Each upload is encoded once per session, not on every rerun.
+    """
+    store = get_attachment_store()
+    known = st.session_state.setdefault("attachment_references", {})
+    references = []
+    for uploaded in uploaded_files or []:
+        if uploaded.file_id not in known:
+            known[uploaded.file_id] = store.add(uploaded, uploaded.name, uploaded.type)
+        references.append(known[uploaded.file_id])
+    return references
+
+class ResolvedCredentials:
+    """Credentials and tenants resolved once per process, and again only when the secrets change"""
+
+    def __init__(self):
+        self._source = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def invalidate(self, *args, **kwargs):
+        self._value = None
+
+    def get(self):
+        # st.secrets is replaced wholesale when secrets are injected, and fires
+        # file_change_listener when secrets.toml is edited
+        source, value = st.secrets, self._value
+        if value is None or self._source is not source:
+            with self._lock:
+                try:
+                    secrets = source.to_dict()
+                except Exception:
+                    secrets = {}
+                credentials = credentials_from_secrets(secrets)
+                value = self._value = (credentials, resolve_tenants(secrets, credentials))
+                self._source = source
+                source.file_change_listener.connect(self.invalidate, weak=False)
+        return value
+
+@st.cache_resource
+def get_resolved_credentials():
+    """Get the process-wide credentials memo"""
+    return ResolvedCredentials()
+
+def get_credentials():
+    """Get (credentials, tenants); environment variables take precedence over Streamlit secrets"""
+    return get_resolved_credentials().get()
+
+def get_tenants():
+    """Get the configured MSP accounts; see enbox_msp.tenants"""
+    return get_credentials()[1]
+
+def get_active_tenant():
+    """Get the tenant selected in the sidebar, or the first configured one; None if there is none"""
+    tenants = get_tenants()
+    if not tenants:
         return None
+    selected = st.session_state.get("tenant")
+    return next((tenant for tenant in tenants if tenant.name == selected), tenants[0])
+
+def get_api_url():
+    """Get the active tenant's MSP API URL"""
+    tenant = get_active_tenant()
+    return tenant.api_url if tenant else get_credentials()[0].api_url
+
+def get_send_email_url():
+    """Get the send-email URL"""
+    return get_credentials()[0].send_email_url
+
+def get_api_key():
+    """Get the active tenant's API key, or None; pages report a missing key with require_api_key"""
+    tenant = get_active_tenant()
+    return tenant.api_key if tenant else None
 
 def get_access_token():
-    """Get access token from Streamlit secrets"""
-    try:
-        return st.secrets["enbox"]["access_token"]
-    except Exception as e:
-        st.error("⚠️ Access token not found in secrets. Please configure it in .streamlit/secrets.toml")
-        st.code("""
+    """Get the send-email access token, or None"""
+    return get_credentials()[0].access_token
+
+def render_missing_secret(description, section, name, example):
+    """Explain how to configure a missing secret"""
+    st.error(f"⚠️ {description} not found in secrets. Please configure it in .streamlit/secrets.toml")
+    st.code(f"""
 # Add this to .streamlit/secrets.toml:
-[enbox]
-access_token = "your_access_token_here"
+[{section}]
+{name} = "{example}"
         """, language="toml")
-        return None
 
-def make_api_request(action, data=None):
-    """Make API request with proper authentication and action"""
+def require_api_key():
+    """Get the active API key, showing configuration help if it is missing"""
     api_key = get_api_key()
     if not api_key:
-        return None, "API key not configured"
+        render_missing_secret("MSP API key", "msp", "api_key", "msp_your_key_here")
+    return api_key
+
+def require_access_token():
+    """Get the access token, showing configuration help if it is missing"""
+    access_token = get_access_token()
+    if not access_token:
+        render_missing_secret("Access token", "enbox", "access_token", "your_access_token_here")
+    return access_token
+
+def make_api_request(action, data=None, api_key=None, stream=False, api_url=None):
+    """Make API request with proper authentication and action
+
+    Pass api_key and api_url explicitly when calling from worker threads,
+    where the session's selected tenant is not available. With
+    stream=True the caller reads and closes the response body.
+    """
+    if api_key is None:
+        api_key = get_api_key()
+    if api_url is None:
+        api_url = get_api_url()
+    return MSPClient(api_key, api_url=api_url, http=get_http_client()).post_action(action, data, stream)
+
+def send_email(email_data, access_token=None):
+    """Send email via Enbox API
+
+    Pass access_token explicitly when calling from worker threads.
+    """
+    if access_token is None:
+        access_token = get_access_token()
+    return MSPClient(access_token=access_token, send_email_url=get_send_email_url(), http=get_http_client(),
+                     attachments=get_attachment_store()).post_email(email_data)
+
+# Inventory cache configuration
+DEFAULT_INVENTORY_TTL_SECONDS = 60
+# Streamed list_enboxes: show the first records, then report progress every N
+STREAM_FIRST_RECORDS = 25
+STREAM_PROGRESS_RECORDS = 10_000
+
+def get_inventory_ttl():
+    """Get inventory cache TTL in seconds from Streamlit secrets"""
+    try:
+        return float(st.secrets["cache"]["inventory_ttl_seconds"])
+    except Exception:
+        return DEFAULT_INVENTORY_TTL_SECONDS
+
+class InventoryCache:
+    """Thread-safe TTL cache of list_enboxes results, shared by all sessions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Keys whose next read must go upstream rather than to the local mirror
+        self._stale = set()
+
+    def get(self, key, ttl):
+        """Return the cached entry for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry["loaded_at"] > ttl:
+                return None
+            return entry
+
+    def put(self, key, enboxes, fetched_at=None, upstream=True):
+        """Store an inventory for key; upstream=False marks it as loaded from the mirror"""
+        entry = {
+            "enboxes": enboxes,
+            "index": {enbox.email: idx for idx, enbox in enumerate(enboxes)},
+            "loaded_at": time.monotonic(),
+            "fetched_at": fetched_at or datetime.now(),
+            # Built on first search so refreshes nobody searches stay cheap
+            "search": None,
+            "search_lock": threading.Lock(),
+            # Bumped by every patch, so memos over the records can tell they changed in place
+            "version": 0,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            if upstream:
+                self._stale.discard(key)
+        return entry
+
+    def patch(self, key, email, **fields):
+        """Apply fields to the cached record for email; return False if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or email not in entry["index"]:
+                return False
+            idx = entry["index"][email]
+            old = entry["enboxes"][idx]
+            # Replace rather than mutate so readers never see a half-updated record
+            new = entry["enboxes"][idx] = old.replace(**fields)
+            entry["version"] += 1
+            if entry["search"] is not None and new.status != old.status:
+                entry["search"].update_status(idx, old.status, new.status)
+            return True
+
+    def search_index(self, key, enboxes):
+        """Return the search index for a cached inventory, building it once per refresh"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry["enboxes"] is not enboxes:
+            return EnboxIndex(enboxes)
+        with entry["search_lock"]:
+            if entry["search"] is None:
+                entry["search"] = EnboxIndex(enboxes)
+            return entry["search"]
+
+    def version(self, key, enboxes):
+        """Return how many patches have been applied to a cached inventory"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry["version"] if entry is not None and entry["enboxes"] is enboxes else 0
     
-    url = API_BASE_URL
-    headers = {
-        "X-MSP-API-Key": api_key,
-        "Content-Type": "application/json"
+    def invalidate(self, key):
+        """Drop the cached inventory for key and require the next read to go upstream"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._stale.add(key)
+
+    def is_stale(self, key):
+        with self._lock:
+            return key in self._stale
+
+@st.cache_resource
+def start_single_flight(window):
+    """Create the process-wide coalescer, once per window setting"""
+    return SingleFlight(window)
+
+def get_single_flight():
+    """Get the process-wide coalescer for inventory reads"""
+    try:
+        window = float(st.secrets["cache"]["coalesce_seconds"])
+    except Exception:
+        window = DEFAULT_COALESCE_SECONDS
+    return start_single_flight(window)
+
+@st.cache_resource
+def get_inventory_cache():
+    """Get the process-wide inventory cache"""
+    return InventoryCache()
+
+def get_mirror_settings():
+    """Get the mirror path and background refresh interval from Streamlit secrets"""
+    try:
+        settings = dict(st.secrets["mirror"])
+    except Exception:
+        settings = {}
+    return settings.get("path", mirror_path()), float(settings.get("refresh_seconds", DEFAULT_REFRESH_SECONDS))
+
+@st.cache_resource
+def start_inventory_mirror(path, interval):
+    """Open the inventory mirror and start its background refresher, once per process"""
+    mirror = InventoryMirror(path)
+    refresher = MirrorRefresher(mirror, interval)
+    refresher.start()
+    return mirror, refresher
+
+def get_inventory_mirror():
+    """Get the process-wide (mirror, refresher) pair"""
+    return start_inventory_mirror(*get_mirror_settings())
+
+def upstream_inventory_fetcher(api_key, url):
+    """Build a list_enboxes call that can run off the script thread"""
+    client = MSPClient(api_key, api_url=url, http=get_http_client())
+    return lambda: list(client.iter_enboxes())
+
+def register_mirror_refresh(api_key, api_url):
+    """Keep this API key's mirror refreshed in the background, updating the cache on changes"""
+    _, refresher = get_inventory_mirror()
+    cache = get_inventory_cache()
+    refresher.register(
+        account_id(api_key),
+        upstream_inventory_fetcher(api_key, api_url),
+        on_change=lambda records, changes: cache.put(api_key, records)
+    )
+
+def fetch_enboxes(force_refresh=False, on_records=None, tenant=None):
+    """List Enboxes from the in-memory cache, then the local mirror, then upstream
+
+    Returns (enboxes, fetched_at, error); fetched_at is when the data last
+    came from upstream. An upstream list is parsed as it downloads, and
+    on_records, if given, is called as on_records(count, first_page) once the
+    first page has arrived and then periodically, always from the caller's
+    own thread. tenant defaults to the session's selected tenant; pass it
+    explicitly from worker threads.
+    """
+    tenant = tenant or get_active_tenant()
+    if not tenant:
+        return None, None, "API key not configured"
+    api_key, api_url = tenant.api_key, tenant.api_url
+    
+    cache = get_inventory_cache()
+    mirror, _ = get_inventory_mirror()
+    account = account_id(api_key)
+    
+    if not force_refresh and not cache.is_stale(api_key):
+        entry = cache.get(api_key, get_inventory_ttl())
+        if not entry:
+            records, refreshed_at = mirror.load(account)
+            if refreshed_at is not None:
+                entry = cache.put(api_key, records, datetime.fromtimestamp(refreshed_at), upstream=False)
+        if entry:
+            register_mirror_refresh(api_key, api_url)
+            status = mirror.status(account)
+            fetched_at = datetime.fromtimestamp(status["refreshed_at"]) if status and status["refreshed_at"] else entry["fetched_at"]
+            return entry["enboxes"], fetched_at, None
+    
+    # Runs on the single-flight thread on behalf of every waiting session,
+    # so it must not touch Streamlit; progress goes out through report.
+    # Failures are raised, so SingleFlight never serves them to later callers
+    def load_upstream(report):
+        response, error = make_api_request("list_enboxes", api_key=api_key, stream=True, api_url=api_url)
+        if error:
+            raise ApiError(f"Error: {error}")
+        
+        with response:
+            if response.status_code != 200:
+                raise ApiError(f"Error {response.status_code}: {response.text}", response.status_code)
+            
+            enboxes = []
+            try:
+                for record in iter_json_array(response.iter_content(STREAM_CHUNK_BYTES)):
+                    enboxes.append(Enbox.from_dict(record))
+                    if len(enboxes) == STREAM_FIRST_RECORDS or len(enboxes) % STREAM_PROGRESS_RECORDS == 0:
+                        report((len(enboxes), tuple(enboxes[:STREAM_FIRST_RECORDS])))
+            except NotAnArray as e:
+                # Only list responses are cached; anything else is shown as-is
+                return e.value, datetime.now(), None
+            except ValueError as e:
+                raise ApiError(f"Error parsing response: {e}") from e
+            except Exception as e:
+                raise ApiError(f"Error: {e}") from e
+        
+        mirror.apply_snapshot(account, enboxes)
+        entry = cache.put(api_key, enboxes)
+        return entry["enboxes"], entry["fetched_at"], None
+    
+    def show_progress(progress):
+        on_records(*progress)
+    
+    # Concurrent sessions share one upstream call, parse and snapshot
+    try:
+        enboxes, fetched_at, error = get_single_flight().do_with_progress(
+            (api_key, api_url), load_upstream, show_progress if on_records else None, action="list_enboxes"
+        )
+    except ApiError as e:
+        return None, None, str(e)
+    if isinstance(enboxes, list):
+        # Registered only once a snapshot is mirrored, so a cold start makes one list call, not two
+        register_mirror_refresh(api_key, api_url)
+    return enboxes, fetched_at, error
+
+def patch_cached_enbox(email, **fields):
+    """Write a successful change through to the cached inventory and the mirror"""
+    api_key = get_api_key()
+    if not api_key:
+        return
+    mirror, _ = get_inventory_mirror()
+    mirror.patch(account_id(api_key), email, **fields)
+    if not get_inventory_cache().patch(api_key, email, **fields):
+        get_inventory_cache().invalidate(api_key)
+
+def invalidate_inventory_cache():
+    """Force the next list_enboxes read to go upstream"""
+    api_key = get_api_key()
+    if api_key:
+        get_inventory_cache().invalidate(api_key)
+
+def render_inventory_freshness(fetched_at):
+    """Show how old the displayed inventory is and whether background refresh is healthy"""
+    _, interval = get_mirror_settings()
+    age = (datetime.now() - fetched_at).total_seconds()
+    st.caption(f"Inventory as of {fetched_at:%H:%M:%S} ({age:.0f}s ago) · refreshed in the background every {interval:g}s")
+    
+    api_key = get_api_key()
+    mirror, _ = get_inventory_mirror()
+    status = mirror.status(account_id(api_key)) if api_key else None
+    if status and status["last_error"] and (status["last_error_at"] or 0) > (status["refreshed_at"] or 0):
+        st.warning(f"⚠️ Background refresh failing, showing the last good copy: {status['last_error']}")
+    elif age > 3 * interval:
+        st.warning("⚠️ Inventory is stale; background refresh has not completed recently.")
+
+# Bulk operation configuration
+BULK_DEFAULT_WORKERS = 8
+BULK_MAX_WORKERS = 32
+BULK_CSV_COLUMNS = ["email", "display_name", "method", "password"]
+ASYNC_DEFAULT_CONCURRENCY = 32
+ASYNC_MAX_CONCURRENCY = 128
+
+def run_concurrently(func, items, max_workers):
+    """Run func over items on a bounded thread pool, yielding (item, result) as each completes"""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def create_enbox_from_row(api_key, api_url, row):
+    """Create one Enbox from a bulk import row and return its result record"""
+    payload = build_create_payload(row["email"], row["display_name"], row["method"], row["password"])
+    response, error = make_api_request("create_enbox", payload, api_key=api_key, api_url=api_url)
+    
+    if error:
+        detail, ok = error, False
+    elif response.status_code in [200, 201]:
+        detail, ok = "Created", True
+    else:
+        detail, ok = f"Error {response.status_code}: {response.text}", False
+    
+    return {
+        "row": row["row"],
+        "email": row["email"],
+        "display_name": row["display_name"],
+        "method": row["method"],
+        "result": "created" if ok else "failed",
+        "detail": detail,
     }
+
+def results_to_csv(results, columns):
+    """Serialize result records to CSV text"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(results)
+    return buffer.getvalue()
+
+def render_bulk_create():
+    """Render the bulk CSV import flow for Enbox creation"""
+    st.subheader("Bulk Import")
+    
+    st.download_button(
+        "⬇️ Download CSV template",
+        data=results_to_csv([], BULK_CSV_COLUMNS),
+        file_name="enbox_import_template.csv",
+        mime="text/csv"
+    )
+    
+    uploaded = st.file_uploader(
+        "Enbox CSV *",
+        type=["csv"],
+        help="Columns: email, display_name, method (direct/invite), password (required for direct)"
+    )
     
+    workers = st.slider(
+        "Parallel requests",
+        min_value=1,
+        max_value=BULK_MAX_WORKERS,
+        value=BULK_DEFAULT_WORKERS,
+        help="Maximum number of create requests in flight at once"
+    )
+    
+    if uploaded:
+        rows = parse_enbox_csv(uploaded.getvalue())
+        valid_rows = [row for row in rows if not row["errors"]]
+        invalid_rows = [row for row in rows if row["errors"]]
+        
+        st.write(f"**{len(rows)}** rows · **{len(valid_rows)}** valid · **{len(invalid_rows)}** with errors")
+        st.dataframe(
+            pd.DataFrame(
+                [{**{k: v for k, v in row.items() if k != "password"}, "errors": "; ".join(row["errors"])} for row in rows]
+            ),
+            hide_index=True,
+            use_container_width=True,
+            height=240
+        )
+        
+        if st.button(f"Create {len(valid_rows)} Enbox(es)", disabled=not valid_rows, use_container_width=True):
+            api_key = require_api_key()
+            api_url = get_api_url()
+            if api_key:
+                results = [
+                    {
+                        "row": row["row"],
+                        "email": row["email"],
+                        "display_name": row["display_name"],
+                        "method": row["method"],
+                        "result": "failed",
+                        "detail": "; ".join(row["errors"]),
+                    }
+                    for row in invalid_rows
+                ]
+                created = failed = 0
+                progress = st.progress(0.0, text="Starting...")
+                
+                for done, (row, result) in enumerate(
+                    run_concurrently(lambda row: create_enbox_from_row(api_key, api_url, row), valid_rows, workers), 1
+                ):
+                    results.append(result)
+                    if result["result"] == "created":
+                        created += 1
+                    else:
+                        failed += 1
+                    progress.progress(
+                        done / len(valid_rows),
+                        text=f"{done}/{len(valid_rows)} processed · {created} created · {failed} failed"
+                    )
+                
+                if created:
+                    invalidate_inventory_cache()
+                
+                results.sort(key=lambda result: result["row"])
+                st.session_state["bulk_create_results"] = results
+    
+    results = st.session_state.get("bulk_create_results")
+    if results:
+        failures = [result for result in results if result["result"] != "created"]
+        
+        metric_cols = st.columns(3)
+        metric_cols[0].metric("Rows", len(results))
+        metric_cols[1].metric("Created", len(results) - len(failures))
+        metric_cols[2].metric("Failed", len(failures))
+        
+        st.dataframe(pd.DataFrame(results), hide_index=True, use_container_width=True)
+        
+        if failures:
+            st.download_button(
+                "⬇️ Download error report",
+                data=results_to_csv(failures, ["row", "email", "display_name", "method", "detail"]),
+                file_name="enbox_import_errors.csv",
+                mime="text/csv"
+            )
+        else:
+            st.success("✅ All Enboxes created successfully!")
+
+# Outbox configuration
+OUTBOX_RECENT_LIMIT = 50
+
+def get_spool_settings():
+    """Get the outbox path and delivery concurrency from Streamlit secrets, falling back to the environment"""
     try:
-        # Prepare payload with action
-        payload = {"action": action}
-        if data:
-            payload.update(data)
-        
-        response = requests.post(url, headers=headers, json=payload)
-        return response, None
-    except Exception as e:
-        return None, str(e)
-
-def send_email(email_data):
-    """Send email via Enbox API"""
+        settings = dict(st.secrets["spool"])
+    except Exception:
+        settings = {}
+    return settings.get("path", spool_path()), int(settings.get("concurrency", SPOOL_WORKER_CONCURRENCY))
+
+@st.cache_resource
+def start_email_spool(path, access_token, url, concurrency=SPOOL_WORKER_CONCURRENCY):
+    """Open the outbox and start its delivery worker, once per process and credentials"""
+    spool = EmailSpool(path)
+    client = MSPClient(access_token=access_token, send_email_url=url, http=get_http_client(),
+                       attachments=get_attachment_store())
+
+    def send(payload):
+        response, error = client.post_email(payload)
+        if error:
+            raise RuntimeError(error)
+        return response
+
+    worker = SpoolWorker(spool, send, concurrency=concurrency)
+    worker.start()
+    return spool, worker
+
+def get_email_spool():
+    """Get the outbox and its worker, or (None, None) if no access token is configured"""
     access_token = get_access_token()
     if not access_token:
-        return None, "Access token not configured"
-    
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
+        return None, None
+    path, concurrency = get_spool_settings()
+    return start_email_spool(path, access_token, get_send_email_url(), concurrency)
+
+def get_max_recipients():
+    """Get the per-message recipient cap from Streamlit secrets"""
+    try:
+        return int(st.secrets["enbox"]["max_recipients_per_message"])
+    except Exception:
+        return DEFAULT_MAX_RECIPIENTS
+
+def format_timestamp(value):
+    """Format an epoch timestamp for status tables"""
+    return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+def outbox_row(message):
+    """Flatten an outbox message into a status table row"""
+    payload = json.loads(message["payload"])
+    recipients = sum(len(payload.get(field) or []) for field in ("to", "cc", "bcc"))
+    return {
+        "id": message["id"],
+        "subject": payload.get("subject"),
+        "recipients": recipients,
+        "status": message["status"],
+        "attempts": message["attempts"],
+        "queued_at": format_timestamp(message["created_at"]),
+        "updated_at": format_timestamp(message["updated_at"]),
+        "last_error": message["last_error"],
     }
+
+@st.fragment
+def render_outbox():
+    """Render outbox status; runs as a fragment so refreshing it leaves the form alone"""
+    spool, _ = get_email_spool()
+    if not spool:
+        return
+    
+    st.markdown("---")
+    header_cols = st.columns([3, 1, 1])
+    with header_cols[0]:
+        st.subheader("📬 Outbox")
+    with header_cols[1]:
+        st.button("🔄 Refresh", key="refresh_outbox", use_container_width=True)
+    with header_cols[2]:
+        if st.button("Retry failed", key="retry_outbox", use_container_width=True):
+            st.toast(f"Requeued {spool.retry_failed()} message(s)")
+    
+    counts = spool.counts()
+    metric_cols = st.columns(4)
+    for col, status in zip(metric_cols, ["queued", "sending", "sent", "failed"]):
+        col.metric(status.title(), counts.get(status, 0))
     
+    message_id = st.text_input("Look up message ID", key="outbox_lookup").strip()
+    if message_id:
+        message = spool.get(message_id)
+        if message:
+            st.json({**outbox_row(message), "response": message["response"]})
+        else:
+            st.warning(f"No queued message with ID {message_id}")
+    
+    messages = spool.recent(OUTBOX_RECENT_LIMIT)
+    if messages:
+        st.dataframe(pd.DataFrame([outbox_row(message) for message in messages]), hide_index=True, use_container_width=True)
+
+# Mail-merge campaign configuration
+CAMPAIGN_STATE_DIR = ".campaigns"
+# Delivery plan rows shown before a spread campaign is sent
+CAMPAIGN_PLAN_PREVIEW_ROWS = 10
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+class MailMergeTemplate:
+    """A {{placeholder}} template compiled once and rendered per recipient"""
+
+    def __init__(self, source):
+        self.source = source
+        # Even positions hold literal text, odd positions hold field names
+        self.parts = PLACEHOLDER_PATTERN.split(source)
+        self.fields = set(self.parts[1::2])
+
+    def render(self, row, escape=None):
+        """Render the template with values from row, optionally escaping each value"""
+        parts = self.parts[:]
+        for idx in range(1, len(parts), 2):
+            value = row[parts[idx]]
+            parts[idx] = escape(value) if escape else value
+        return "".join(parts)
+
+def parse_campaign_csv(data):
+    """Parse a recipient CSV into (columns, rows), keeping the first row per email"""
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    columns = [(column or "").strip() for column in reader.fieldnames or []]
+    rows = []
+    seen = set()
+    for record in reader:
+        row = {column: (value or "").strip() for column, value in zip(columns, record.values())}
+        email = row.get("email", "").lower()
+        if email and email not in seen:
+            seen.add(email)
+            rows.append(row)
+    return columns, rows
+
+def campaign_id(recipients_csv, settings):
+    """Identify a campaign by its recipient list and templates so a rerun can resume it"""
+    digest = hashlib.sha256(recipients_csv)
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+def campaign_journal_path(cid):
+    """Return the path of a campaign's delivery journal"""
+    return os.path.join(CAMPAIGN_STATE_DIR, f"{cid}.jsonl")
+
+def load_campaign_journal(cid):
+    """Return the latest delivery record per recipient from a campaign's journal"""
+    records = {}
     try:
-        response = requests.post(SEND_EMAIL_URL, headers=headers, json=email_data)
-        return response, None
-    except Exception as e:
-        return None, str(e)
+        with open(campaign_journal_path(cid)) as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted run
+                    continue
+                records[record["email"]] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+def send_campaign_message(access_token, settings, templates, row, scheduled_at=None):
+    """Render and send one campaign message and return its delivery record"""
+    email = row["email"]
+    try:
+        payload = {
+            "to": [email],
+            "subject": templates["subject"].render(row),
+            "send_via": settings["send_via"],
+            "read_receipt_requested": settings["read_receipt"],
+        }
+        if settings.get("attachments"):
+            payload["attachments"] = settings["attachments"]
+        if scheduled_at:
+            payload["scheduled_at"] = scheduled_at
+        if "body_text" in templates:
+            payload["body_text"] = templates["body_text"].render(row)
+        if "body_html" in templates:
+            payload["body_html"] = templates["body_html"].render(row, escape=html.escape)
+    except KeyError as e:
+        return {"email": email, "status": "failed", "detail": f"Missing value for {e}"}
+    
+    response, error = send_email(payload, access_token=access_token)
+    
+    if error:
+        detail, status = error, "failed"
+    elif response.status_code in [200, 201]:
+        detail, status = f"Scheduled for {scheduled_at}" if scheduled_at else "Sent", "sent"
+    else:
+        detail, status = f"Error {response.status_code}: {response.text}", "failed"
+    
+    return {"email": email, "status": status, "detail": detail, "at": datetime.now().isoformat(timespec="seconds")}
+
+def render_campaign():
+    """Render the mail-merge campaign flow"""
+    st.subheader("Campaign")
+    
+    uploaded = st.file_uploader(
+        "Recipients CSV *",
+        type=["csv"],
+        help="Needs an 'email' column; every column can be used as a {{placeholder}}"
+    )
+    
+    subject = st.text_input(
+        "Subject Template *",
+        placeholder="Your account update, {{display_name}}",
+        key="campaign_subject"
+    )
+    
+    email_format = st.radio(
+        "Email Format",
+        options=["Plain Text", "HTML", "Both"],
+        horizontal=True,
+        key="campaign_format"
+    )
+    
+    body_text = ""
+    body_html = ""
+    
+    if email_format in ["Plain Text", "Both"]:
+        body_text = st.text_area(
+            "Plain Text Template *",
+            placeholder="Hello {{display_name}},",
+            height=150,
+            key="campaign_body_text"
+        )
+    
+    if email_format in ["HTML", "Both"]:
+        body_html = st.text_area(
+            "HTML Template *",
+            placeholder="<p>Hello {{display_name}},</p>",
+            height=150,
+            key="campaign_body_html"
+        )
+    
+    col_a, col_b = st.columns(2)
+    with col_a:
+        send_via = st.selectbox("Send Via", options=["enbox", "smtp"], key="campaign_send_via")
+        read_receipt = st.checkbox("Request Read Receipt", key="campaign_read_receipt")
+        optimize_html = st.checkbox(
+            "Optimize HTML",
+            value=True,
+            key="campaign_optimize_html",
+            help="Inline CSS, minify, and derive a plain-text body if there is none"
+        )
+    with col_b:
+        workers = st.slider(
+            "Parallel sends",
+            min_value=1,
+            max_value=BULK_MAX_WORKERS,
+            value=BULK_DEFAULT_WORKERS,
+            key="campaign_workers"
+        )
+    
+    attachment_files = st.file_uploader(
+        "Attachments",
+        accept_multiple_files=True,
+        help="Attached to every message; each file is encoded once for the whole campaign",
+        key="campaign_attachments"
+    )
+    
+    spread = st.checkbox(
+        "Spread delivery over a time window",
+        help="Give each message its own scheduled_at so the upstream delivers them evenly instead of all at once",
+        key="campaign_spread"
+    )
+    if spread:
+        # Default to the next whole five minutes; kept in session state so reruns do not move it
+        next_slot = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        next_slot += timedelta(minutes=5 - next_slot.minute % 5)
+        st.session_state.setdefault("campaign_spread_date", next_slot.date())
+        st.session_state.setdefault("campaign_spread_time", next_slot.time())
+        spread_cols = st.columns(4)
+        start_date = spread_cols[0].date_input("Start date (UTC)", key="campaign_spread_date")
+        start_time = spread_cols[1].time_input("Start time (UTC)", key="campaign_spread_time")
+        window_minutes = spread_cols[2].number_input(
+            "Window (minutes)", min_value=1, value=DEFAULT_WINDOW_MINUTES, key="campaign_spread_window"
+        )
+        max_per_minute = spread_cols[3].number_input(
+            "Max messages/minute", min_value=1, value=DEFAULT_MAX_PER_MINUTE, key="campaign_spread_rate"
+        )
+    
+    if not uploaded:
+        return
+    
+    recipients_csv = uploaded.getvalue()
+    columns, rows = parse_campaign_csv(recipients_csv)
+    
+    # Compile each template once for the whole campaign
+    templates = {"subject": MailMergeTemplate(subject)}
+    if body_text.strip():
+        templates["body_text"] = MailMergeTemplate(body_text)
+    if body_html.strip():
+        templates["body_html"] = MailMergeTemplate(body_html)
+    
+    errors = []
+    if "email" not in columns:
+        errors.append("Recipients CSV needs an 'email' column")
+    elif not rows:
+        errors.append("Recipients CSV has no recipients with an email")
+    if not subject.strip():
+        errors.append("Subject template is required")
+    if "body_text" not in templates and "body_html" not in templates:
+        errors.append("At least one body template is required")
+    unknown = set().union(*(template.fields for template in templates.values())) - set(columns)
+    if unknown:
+        errors.append(f"Placeholders with no matching CSV column: {', '.join(sorted(unknown))}")
+    
+    if errors:
+        for error in errors:
+            st.error(f"❌ {error}")
+        return
+    
+    settings = {
+        "subject": subject,
+        "body_text": templates["body_text"].source if "body_text" in templates else "",
+        "body_html": templates["body_html"].source if "body_html" in templates else "",
+        "send_via": send_via,
+        "read_receipt": read_receipt,
+        "attachments": add_attachments(attachment_files),
+    }
+    cid = campaign_id(recipients_csv, settings)
+    journal = load_campaign_journal(cid)
+    pending = [row for row in rows if journal.get(row["email"], {}).get("status") != "sent"]
+    
+    # The template is processed once, before rendering, so every message reuses the result;
+    # the campaign ID is taken from the sources above so optimizing never restarts a campaign
+    if optimize_html and "body_html" in templates:
+        processed = get_html_pipeline().process(templates["body_html"].source)
+        templates["body_html"] = MailMergeTemplate(processed.html)
+        if "body_text" not in templates:
+            templates["body_text"] = MailMergeTemplate(processed.text)
+    
+    with st.expander("👀 Preview first message"):
+        st.write("**To:**", rows[0]["email"])
+        st.write("**Subject:**", templates["subject"].render(rows[0]))
+        if "body_text" in templates:
+            st.text(templates["body_text"].render(rows[0]))
+        if "body_html" in templates:
+            st.html(templates["body_html"].render(rows[0], escape=html.escape))
+    
+    sent = len(rows) - len(pending)
+    st.write(f"**{len(rows)}** recipients · **{sent}** already sent · **{len(pending)}** to send")
+    if sent:
+        st.caption(f"Campaign {cid} was started before; recipients already sent will be skipped.")
+    
+    slots = {}
+    plan_ok = True
+    if spread and pending:
+        start = datetime.combine(start_date, start_time, tzinfo=timezone.utc)
+        plan = plan_schedule(len(pending), start, window_minutes, max_per_minute)
+        slots = {row["email"]: plan.scheduled_at(number) for number, row in enumerate(pending)}
+        with st.expander("🗓️ Delivery plan", expanded=True):
+            st.write(
+                f"**{len(plan)}** messages from **{plan.scheduled_at(0)}** to **{plan.scheduled_at(len(plan) - 1)}**, "
+                f"one every {plan.interval:.1f}s (about {plan.per_minute:.0f}/minute)"
+            )
+            if start < datetime.now(timezone.utc):
+                plan_ok = False
+                st.error("❌ The start time is in the past")
+            if plan.overruns:
+                st.warning(
+                    f"⚠️ At {max_per_minute}/minute the last message goes out after the "
+                    f"{window_minutes}-minute window; widen the window or raise the rate"
+                )
+            per_minute = plan.per_minute_counts()
+            st.bar_chart(pd.Series(list(per_minute.values()), index=list(per_minute.keys()), name="Messages"))
+            st.dataframe(
+                pd.DataFrame(
+                    [{"email": row["email"], "scheduled_at": slots[row["email"]]} for row in pending[:CAMPAIGN_PLAN_PREVIEW_ROWS]]
+                ),
+                hide_index=True,
+                use_container_width=True
+            )
+    
+    label = f"📤 {'Resume' if sent else 'Send'} campaign to {len(pending)} recipient(s)"
+    if st.button(label, disabled=not pending or not plan_ok, use_container_width=True, key="campaign_send"):
+        access_token = require_access_token()
+        if access_token:
+            os.makedirs(CAMPAIGN_STATE_DIR, exist_ok=True)
+            progress = st.progress(0.0, text="Starting...")
+            failed = 0
+            with open(campaign_journal_path(cid), "a") as journal_file:
+                for done, (row, record) in enumerate(
+                    run_concurrently(
+                        lambda row: send_campaign_message(access_token, settings, templates, row, slots.get(row["email"])),
+                        pending,
+                        workers
+                    ),
+                    1
+                ):
+                    # Journal every outcome as it lands so an interrupted run can resume
+                    journal_file.write(json.dumps(record) + "\n")
+                    journal_file.flush()
+                    journal[record["email"]] = record
+                    if record["status"] != "sent":
+                        failed += 1
+                    progress.progress(
+                        done / len(pending),
+                        text=f"{done}/{len(pending)} processed · {done - failed} sent · {failed} failed"
+                    )
+            # Rerun so the counts and the resume button reflect the journal
+            st.rerun()
+    
+    if journal:
+        statuses = [journal.get(row["email"], {"email": row["email"], "status": "pending", "detail": ""}) for row in rows]
+        failures = [record for record in statuses if record["status"] == "failed"]
+        
+        metric_cols = st.columns(3)
+        metric_cols[0].metric("Sent", sum(1 for record in statuses if record["status"] == "sent"))
+        metric_cols[1].metric("Failed", len(failures))
+        metric_cols[2].metric("Pending", sum(1 for record in statuses if record["status"] == "pending"))
+        
+        st.dataframe(pd.DataFrame(statuses), hide_index=True, use_container_width=True)
+        
+        if failures:
+            st.download_button(
+                "⬇️ Download failed recipients",
+                data=results_to_csv(failures, ["email", "detail", "at"]),
+                file_name=f"campaign_{cid}_failures.csv",
+                mime="text/csv"
+            )
+
+# Manage Enboxes view configuration
+PAGE_SIZE_OPTIONS = [25, 50, 100, 250]
+TABLE_COLUMNS = {
+    "email": "Email",
+    "display_name": "Display Name",
+    "status": "Status",
+    "create_via": "Created Via",
+    "created_at": "Created",
+}
+
+def enbox_row(enbox):
+    """Flatten an Enbox into a table row"""
+    return {
+        "email": enbox.email,
+        "display_name": enbox.display_name,
+        "status": enbox.status,
+        "create_via": enbox.method,
+        "created_at": enbox.created_at,
+    }
+
+def sorted_order(enboxes, column, descending, version=0):
+    """Return the record order for a sort column, memoized per inventory in the session
+
+    version is the inventory's patch count; records are patched in place, so
+    the list alone does not show that a sort is out of date.
+    """
+    memo = st.session_state.get("enbox_sort_memo")
+    if memo and memo["enboxes"] is enboxes and memo["key"] == (len(enboxes), column, descending, version):
+        return memo["order"]
+    
+    def sort_key(idx):
+        value = enbox_row(enboxes[idx])[column]
+        # Missing values sort last regardless of direction
+        return (value is None) != descending, str(value or "").lower()
+    
+    order = sorted(range(len(enboxes)), key=sort_key, reverse=descending)
+    st.session_state["enbox_sort_memo"] = {
+        "enboxes": enboxes,
+        "key": (len(enboxes), column, descending, version),
+        "order": order,
+    }
+    return order
+
+def set_enbox_status(enbox, activate):
+    """Activate or deactivate one Enbox and write the change through to the cache"""
+    action = "activate_enbox" if activate else "deactivate_enbox"
+    with st.spinner("Activating..." if activate else "Deactivating..."):
+        resp, err = make_api_request(action, {"email": enbox.email})
+        if err:
+            st.error(f"Error: {err}")
+        elif resp and resp.status_code == 200:
+            st.success("✅ Activated!" if activate else "✅ Deactivated!")
+            # Patch the cached record so the rerun does not refetch the list
+            patch_cached_enbox(enbox.email, status=STATUS_ACTIVE if activate else STATUS_INACTIVE)
+            st.rerun()
+        else:
+            st.error(f"Error: {resp.text if resp else 'Unknown'}")
+
+def render_enbox_details(enbox, key):
+    """Render one Enbox's fields, its activation toggle and raw record"""
+    cols = st.columns([2, 2, 1])
+    
+    with cols[0]:
+        st.write("**Email:**", enbox.email or 'N/A')
+        st.write("**Display Name:**", enbox.display_name or 'N/A')
+    
+    with cols[1]:
+        st.write("**Status:**", enbox.status.upper())
+        st.write("**Created Via:**", enbox.method or 'N/A')
+        if enbox.created_at:
+            st.write("**Created:**", enbox.created_at)
+    
+    with cols[2]:
+        # Activate/Deactivate buttons
+        if enbox.is_active:
+            if st.button("🔴 Deactivate", key=f"deactivate_{key}", use_container_width=True):
+                set_enbox_status(enbox, activate=False)
+        else:
+            if st.button("🟢 Activate", key=f"activate_{key}", use_container_width=True):
+                set_enbox_status(enbox, activate=True)
+    
+    st.markdown("---")
+    st.json(enbox.to_dict())
+
+async def change_enbox_statuses(api_url, api_key, emails, activate, concurrency, on_result):
+    """Activate or deactivate many Enboxes through the async client"""
+    async with AsyncMSPClient(api_key=api_key, api_url=api_url, concurrency=concurrency) as client:
+        return await client.set_status_many(emails, activate, on_result=on_result)
+
+@st.fragment
+def render_bulk_status_change(enboxes, selected_enboxes):
+    """Render bulk activate/deactivate by table selection or by filter
+
+    Runs as a fragment so adjusting filters does not re-render the table.
+    """
+    with st.expander("⚡ Bulk Actions", expanded=len(selected_enboxes) > 1):
+        target_mode = st.radio(
+            "Apply to",
+            options=["Selected rows", "Filter"],
+            horizontal=True,
+            help="Select rows in the table, or match Enboxes by domain and status"
+        )
+        
+        if target_mode == "Selected rows":
+            targets = selected_enboxes
+        else:
+            filter_cols = st.columns(2)
+            with filter_cols[0]:
+                domains = st.multiselect("Domain", options=sorted({enbox.domain for enbox in enboxes}))
+            with filter_cols[1]:
+                statuses = st.multiselect("Status", options=sorted({enbox.status for enbox in enboxes}))
+            
+            targets = [
+                enbox for enbox in enboxes
+                if (not domains or enbox.domain in domains)
+                and (not statuses or enbox.status in statuses)
+            ] if domains or statuses else []
+        
+        action_cols = st.columns([1, 2])
+        with action_cols[0]:
+            activate = st.radio("Action", options=["Activate", "Deactivate"], horizontal=True) == "Activate"
+        with action_cols[1]:
+            concurrency = st.slider(
+                "Parallel requests",
+                min_value=1,
+                max_value=ASYNC_MAX_CONCURRENCY,
+                value=ASYNC_DEFAULT_CONCURRENCY,
+                key="bulk_status_concurrency"
+            )
+        
+        # Enboxes already in the requested state need no upstream call
+        emails = [enbox.email for enbox in targets if enbox.email and enbox.is_active != activate]
+        skipped = len(targets) - len(emails)
+        st.caption(f"{len(targets)} Enbox(es) matched · {skipped} already {'active' if activate else 'inactive'}")
+        
+        label = f"{'🟢 Activate' if activate else '🔴 Deactivate'} {len(emails)} Enbox(es)"
+        if st.button(label, disabled=not emails, use_container_width=True):
+            api_key = require_api_key()
+            if api_key:
+                progress = st.progress(0.0, text="Starting...")
+                done = []
+                
+                def on_result(result):
+                    done.append(result)
+                    progress.progress(len(done) / len(emails), text=f"{len(done)}/{len(emails)} processed")
+                
+                results = asyncio.run(change_enbox_statuses(get_api_url(), api_key, emails, activate, concurrency, on_result))
+                results = [
+                    {"email": result.key, "result": "updated" if result.ok else "failed", "detail": result.detail}
+                    for result in results
+                ]
+                st.session_state["bulk_status_results"] = results
+                # Refresh the list once for the whole batch
+                invalidate_inventory_cache()
+                st.rerun()
+
+def render_bulk_status_results(results):
+    """Render the aggregated outcome of the last bulk status change"""
+    failures = [result for result in results if result["result"] != "updated"]
+    
+    st.markdown("#### Last Bulk Action")
+    metric_cols = st.columns(3)
+    metric_cols[0].metric("Requested", len(results))
+    metric_cols[1].metric("Updated", len(results) - len(failures))
+    metric_cols[2].metric("Failed", len(failures))
+    
+    if failures:
+        st.dataframe(pd.DataFrame(failures), hide_index=True, use_container_width=True)
+        st.download_button(
+            "⬇️ Download error report",
+            data=results_to_csv(failures, ["email", "detail"]),
+            file_name="enbox_status_errors.csv",
+            mime="text/csv"
+        )
+    
+    if st.button("Dismiss", key="dismiss_bulk_status"):
+        del st.session_state["bulk_status_results"]
+        st.rerun()
 
-# Create tabs matching the MSP Control Center design
-tab1, tab2, tab3, tab4 = st.tabs(["⚙️ Manage Enboxes", "➕ Create Enboxes", "📧 Send Email", "📋 Enbox MSP API"])
+EXPORT_FORMAT_LABELS = {"csv": "CSV", "jsonl": "JSON Lines", "parquet": "Parquet"}
 
-# Tab 1: Manage Enboxes
-with tab1:
+def render_inventory_export(enboxes, order, filtered, fetched_at):
+    """Offer the inventory, or just the records matching the filters, as a download in display order"""
+    with st.expander("⬇️ Export"):
+        cols = st.columns(2)
+        with cols[0]:
+            export_format = st.radio(
+                "Format",
+                options=list(EXPORT_FORMATS),
+                format_func=EXPORT_FORMAT_LABELS.get,
+                horizontal=True,
+                key="export_format"
+            )
+        indices = range(len(enboxes))
+        if filtered:
+            with cols[1]:
+                scope = st.radio(
+                    "Records",
+                    options=["matching", "all"],
+                    format_func=lambda option: f"{len(order):,} matching" if option == "matching" else f"All {len(enboxes):,}",
+                    horizontal=True,
+                    key="export_scope"
+                )
+            if scope == "matching":
+                indices = order
+        
+        def build_export():
+            # Runs on click, off the script thread; records are encoded into a temp file
+            # one batch at a time rather than through a DataFrame or one big string.
+            # Unbuffered, because Streamlit only accepts raw files from a callable
+            f = tempfile.TemporaryFile(buffering=0)
+            write_export((enboxes[idx] for idx in indices), export_format, f)
+            f.seek(0)
+            return f
+        
+        st.download_button(
+            f"⬇️ Download {len(indices):,} Enbox(es) as {EXPORT_FORMAT_LABELS[export_format]}",
+            data=build_export,
+            file_name=f"enboxes_{fetched_at:%Y%m%d_%H%M%S}.{export_format}",
+            mime=EXPORT_FORMATS[export_format],
+            on_click="ignore"
+        )
+        st.caption("CSV and Parquet hold the standard columns; JSON Lines keeps every field the API returned.")
+
+# Section 1: Manage Enboxes
+def manage_enboxes_page():
+    """Render the Manage Enboxes section"""
     st.header("Managed Enboxes")
+    if not require_api_key():
+        return
     
     col1, col2 = st.columns([3, 1])
     
     with col2:
-        if st.button("🔄 Refresh List", use_container_width=True):
-            st.rerun()
+        force_refresh = st.button("🔄 Refresh List", use_container_width=True)
     
     with st.spinner("Fetching Enboxes..."):
-        response, error = make_api_request("list_enboxes")
+        # While a large list streams in, show its first page and a running count
+        progress = st.empty()
+        preview = st.empty()
+        
+        previewed = False
+        
+        def show_progress(count, first_page):
+            nonlocal previewed
+            progress.caption(f"Loading Enboxes... {count:,} received")
+            if not previewed:
+                previewed = True
+                preview.dataframe(
+                    pd.DataFrame([enbox_row(enbox) for enbox in first_page], columns=list(TABLE_COLUMNS)),
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config=TABLE_COLUMNS
+                )
+        
+        enboxes, fetched_at, error = fetch_enboxes(force_refresh=force_refresh, on_records=show_progress)
+        progress.empty()
+        preview.empty()
         
         if error:
-            st.error(f"❌ Error: {error}")
-        elif response:
-            if response.status_code == 200:
-                try:
-                    enboxes = response.json()
+            st.error(f"❌ {error}")
+        elif isinstance(enboxes, list):
+            with col1:
+                render_inventory_freshness(fetched_at)
+            
+            if len(enboxes) == 0:
+                st.info("📭 No Enboxes found. Create your first one using the 'Create Enboxes' page.")
+            else:
+                st.success(f"✅ Found {len(enboxes)} Enbox(es)")
+                
+                # Search and filters are answered from the index, never by scanning records
+                search_index = get_inventory_cache().search_index(get_api_key(), enboxes)
+                filters = st.columns([2, 1, 1, 1])
+                with filters[0]:
+                    query = st.text_input("Search", placeholder="Email or display name", help="Matches the start of the email, the name or any word in them", key="search_query")
+                with filters[1]:
+                    statuses = st.multiselect("Status", options=sorted(search_index.status), key="search_statuses")
+                with filters[2]:
+                    domains = st.multiselect("Domain", options=sorted(search_index.domain), key="search_domains")
+                with filters[3]:
+                    methods = st.multiselect("Method", options=sorted(search_index.method), key="search_methods")
+                matched = search_index.search(query, statuses, domains, methods)
+                filter_key = hash((query, tuple(statuses), tuple(domains), tuple(methods)))
+                
+                # View controls; only the current page is ever rendered
+                ctrl = st.columns([1, 2, 1, 1, 1])
+                with ctrl[0]:
+                    view_mode = st.radio("View", ["Table", "Cards"], horizontal=True)
+                with ctrl[1]:
+                    sort_column = st.selectbox(
+                        "Sort by",
+                        options=list(TABLE_COLUMNS),
+                        format_func=TABLE_COLUMNS.get
+                    )
+                with ctrl[2]:
+                    descending = st.toggle("Descending")
+                with ctrl[3]:
+                    page_size = st.selectbox("Page size", options=PAGE_SIZE_OPTIONS)
+                
+                version = get_inventory_cache().version(get_api_key(), enboxes)
+                order = sorted_order(enboxes, sort_column, descending, version)
+                if matched is not None:
+                    matched = set(matched)
+                    order = [idx for idx in order if idx in matched]
+                
+                total_pages = max(1, math.ceil(len(order) / page_size))
+                with ctrl[4]:
+                    # Keyed by the filters so a narrower result set starts again at page 1
+                    page = st.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1, key=f"enbox_page_{filter_key}")
+                
+                start = (page - 1) * page_size
+                page_enboxes = [enboxes[idx] for idx in order[start:start + page_size]]
+                if not order:
+                    st.info("🔍 No Enboxes match the search and filters.")
+                else:
+                    matched_note = f" matching ({len(enboxes)} total)" if matched is not None else ""
+                    st.caption(f"Showing {start + 1}–{start + len(page_enboxes)} of {len(order)}{matched_note} · page {page} of {total_pages}")
+                
+                selected_enboxes = []
+                if view_mode == "Table":
+                    table = pd.DataFrame([enbox_row(enbox) for enbox in page_enboxes], columns=list(TABLE_COLUMNS))
+                    event = st.dataframe(
+                        table,
+                        hide_index=True,
+                        use_container_width=True,
+                        column_config=TABLE_COLUMNS,
+                        on_select="rerun",
+                        selection_mode="multi-row",
+                        # Reset the selection whenever the page contents change
+                        key=f"enbox_table_{sort_column}_{descending}_{page_size}_{page}_{filter_key}"
+                    )
                     
-                    if isinstance(enboxes, list):
-                        if len(enboxes) == 0:
-                            st.info("📭 No Enboxes found. Create your first one using the 'Create Enboxes' tab.")
-                        else:
-                            st.success(f"✅ Found {len(enboxes)} Enbox(es)")
-                            
-                            # Display as table
-                            for idx, enbox in enumerate(enboxes, 1):
-                                enbox_id = enbox.get('id', enbox.get('email', idx))
-                                status = enbox.get('status', 'unknown')
-                                is_active = status == 'active'
-                                
-                                with st.expander(f"📧 {enbox.get('email', 'Unknown')} - {enbox.get('display_name', 'N/A')}", expanded=False):
-                                    cols = st.columns([2, 2, 1])
-                                    
-                                    with cols[0]:
-                                        st.write("**Email:**", enbox.get('email', 'N/A'))
-                                        st.write("**Display Name:**", enbox.get('display_name', 'N/A'))
-                                    
-                                    with cols[1]:
-                                        st.write("**Status:**", status.upper() if status else 'N/A')
-                                        st.write("**Created Via:**", enbox.get('create_via', enbox.get('method', 'N/A')))
-                                        if 'created_at' in enbox:
-                                            st.write("**Created:**", enbox['created_at'])
-                                    
-                                    with cols[2]:
-                                        # Activate/Deactivate buttons
-                                        if is_active:
-                                            if st.button("🔴 Deactivate", key=f"deactivate_{enbox_id}", use_container_width=True):
-                                                with st.spinner("Deactivating..."):
-                                                    resp, err = make_api_request("deactivate_enbox", {"email": enbox.get('email')})
-                                                    if err:
-                                                        st.error(f"Error: {err}")
-                                                    elif resp and resp.status_code == 200:
-                                                        st.success("✅ Deactivated!")
-                                                        st.rerun()
-                                                    else:
-                                                        st.error(f"Error: {resp.text if resp else 'Unknown'}")
-                                        else:
-                                            if st.button("🟢 Activate", key=f"activate_{enbox_id}", use_container_width=True):
-                                                with st.spinner("Activating..."):
-                                                    resp, err = make_api_request("activate_enbox", {"email": enbox.get('email')})
-                                                    if err:
-                                                        st.error(f"Error: {err}")
-                                                    elif resp and resp.status_code == 200:
-                                                        st.success("✅ Activated!")
-                                                        st.rerun()
-                                                    else:
-                                                        st.error(f"Error: {resp.text if resp else 'Unknown'}")
-                                    
-                                    st.markdown("---")
-                                    st.json(enbox)
+                    # Details are only loaded for a single selected row
+                    selected_enboxes = [page_enboxes[row] for row in event.selection.rows]
+                    if len(selected_enboxes) == 1:
+                        enbox = selected_enboxes[0]
+                        st.subheader(f"📧 {enbox.email or 'Unknown'} - {enbox.display_name or 'N/A'}")
+                        render_enbox_details(enbox, key=enbox.id or enbox.email)
+                    elif selected_enboxes:
+                        st.caption(f"{len(selected_enboxes)} Enboxes selected. Use Bulk Actions below to change them together.")
                     else:
-                        st.json(enboxes)
-                        
-                except Exception as e:
-                    st.error(f"Error parsing response: {e}")
-                    st.write(response.text)
-            else:
-                st.error(f"❌ Error {response.status_code}: {response.text}")
+                        st.caption("Select a row to view details and activate or deactivate the Enbox.")
+                else:
+                    for idx, enbox in enumerate(page_enboxes, start + 1):
+                        enbox_id = enbox.id or enbox.email or idx
+                        with st.expander(f"📧 {enbox.email or 'Unknown'} - {enbox.display_name or 'N/A'}", expanded=False):
+                            render_enbox_details(enbox, key=enbox_id)
+                
+                render_inventory_export(enboxes, order, matched is not None, fetched_at)
+                render_bulk_status_change(enboxes, selected_enboxes)
+            
+            results = st.session_state.get("bulk_status_results")
+            if results:
+                render_bulk_status_results(results)
+        elif enboxes is not None:
+            st.json(enboxes)
 
-# Tab 2: Create Enboxes
-with tab2:
+# Section 2: Create Enboxes
+def create_enboxes_page():
+    """Render the Create Enboxes section"""
     st.header("Create New Managed Enbox")
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        with st.form("create_enbox_form"):
-            st.subheader("Account Details")
-            
-            email = st.text_input(
-                "Email Address *",
-                placeholder="customer@example.com",
-                help="The email address for the new Enbox account"
-            )
-            
-            display_name = st.text_input(
-                "Display Name *",
-                placeholder="Customer Name",
-                help="The display name for the customer"
-            )
-            
-            create_via = st.radio(
-                "Account Creation Method *",
-                options=["direct", "invite"],
-                help="Direct: Create with password | Invite: Send invitation email"
-            )
-            
-            password = ""
-            if create_via == "direct":
-                password = st.text_input(
-                    "Password *",
-                    type="password",
-                    placeholder="Enter a secure password",
-                    help="Required for direct account creation"
-                )
+        create_mode = st.radio("Mode", ["Single Enbox", "Bulk CSV Import"], horizontal=True)
+        
+        if create_mode == "Bulk CSV Import":
+            render_bulk_create()
+        else:
+            with st.form("create_enbox_form"):
+                st.subheader("Account Details")
                 
-                password_confirm = st.text_input(
-                    "Confirm Password *",
-                    type="password",
-                    placeholder="Re-enter the password"
+                email = st.text_input(
+                    "Email Address *",
+                    placeholder="customer@example.com",
+                    help="The email address for the new Enbox account"
                 )
-            
-            st.markdown("---")
-            submitted = st.form_submit_button("Create Enbox", use_container_width=True)
-            
-            if submitted:
-                # Validation
-                errors = []
                 
-                if not email or "@" not in email:
-                    errors.append("Valid email address is required")
+                display_name = st.text_input(
+                    "Display Name *",
+                    placeholder="Customer Name",
+                    help="The display name for the customer"
+                )
                 
-                if not display_name:
-                    errors.append("Display name is required")
+                create_via = st.radio(
+                    "Account Creation Method *",
+                    options=CREATE_METHODS,
+                    help="Direct: Create with password | Invite: Send invitation email"
+                )
                 
+                password = ""
                 if create_via == "direct":
-                    if not password:
-                        errors.append("Password is required for direct creation")
-                    elif len(password) < 8:
-                        errors.append("Password must be at least 8 characters long")
-                    elif password != password_confirm:
-                        errors.append("Passwords do not match")
-                
-                if errors:
-                    for error in errors:
-                        st.error(f"❌ {error}")
-                else:
-                    # Prepare payload with new structure
-                    payload = {
-                        "method": create_via,
-                        "email": email,
-                        "display_name": display_name
-                    }
+                    password = st.text_input(
+                        "Password *",
+                        type="password",
+                        placeholder="Enter a secure password",
+                        help="Required for direct account creation"
+                    )
                     
-                    if create_via == "direct":
-                        payload["password"] = password
+                    password_confirm = st.text_input(
+                        "Confirm Password *",
+                        type="password",
+                        placeholder="Re-enter the password"
+                    )
+                
+                st.markdown("---")
+                submitted = st.form_submit_button("Create Enbox", use_container_width=True)
+                
+                if submitted:
+                    # Validation
+                    errors = validate_enbox_fields(
+                        email, display_name, create_via, password,
+                        password_confirm if create_via == "direct" else None
+                    )
                     
-                    # Make API request
-                    with st.spinner("Creating Enbox account..."):
-                        response, error = make_api_request("create_enbox", payload)
+                    if errors:
+                        for error in errors:
+                            st.error(f"❌ {error}")
+                    else:
+                        # Prepare payload with new structure
+                        payload = build_create_payload(email, display_name, create_via, password)
                         
-                        if error:
-                            st.error(f"❌ Error: {error}")
-                        elif response:
-                            if response.status_code in [200, 201]:
-                                st.success("✅ Enbox account created successfully!")
-                                
-                                # Display response data
-                                try:
-                                    result = response.json()
-                                    st.json(result)
-                                except:
-                                    st.write(response.text)
-                                
-                                # Clear form (rerun)
-                                st.balloons()
-                            else:
-                                st.error(f"❌ Error {response.status_code}: {response.text}")
-    
+                        # Make API request
+                        with st.spinner("Creating Enbox account..."):
+                            response, error = make_api_request("create_enbox", payload)
+                            
+                            if error:
+                                st.error(f"❌ Error: {error}")
+                            elif response:
+                                if response.status_code in [200, 201]:
+                                    st.success("✅ Enbox account created successfully!")
+                                    invalidate_inventory_cache()
+                                    
+                                    # Display response data
+                                    try:
+                                        result = response.json()
+                                        st.json(result)
+                                    except:
+                                        st.write(response.text)
+                                    
+                                    # Clear form (rerun)
+                                    st.balloons()
+                                else:
+                                    st.error(f"❌ Error {response.status_code}: {response.text}")
+        
     with col2:
         st.info("""
         ### 📋 Quick Guide
@@ -311,180 +1491,221 @@ with tab2:
         - User sets own password
         - More secure for distribution
         
+        **Bulk Import:**
+        - Upload a CSV with email, display_name, method, password
+        - Rows are validated before anything is created
+        - Download the error report to fix and retry failed rows
+        
         **Tips:**
         - Use strong passwords (8+ chars)
         - Use invite for better security
         - Verify email format
         """)
 
-# Tab 3: Send Email
-with tab3:
+# Section 3: Send Email
+def send_email_page():
+    """Render the Send Email section"""
     st.header("Send Email via Enbox")
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        with st.form("send_email_form"):
-            st.subheader("Email Details")
-            
-            # Recipients
-            to_emails = st.text_area(
-                "To (Recipients) *",
-                placeholder="recipient1@enbox\nrecipient2@enbox",
-                help="Enter email addresses, one per line"
-            )
-            
-            cc_emails = st.text_area(
-                "CC",
-                placeholder="cc@enbox",
-                help="Enter CC email addresses, one per line (optional)"
-            )
-            
-            bcc_emails = st.text_area(
-                "BCC",
-                placeholder="bcc@enbox",
-                help="Enter BCC email addresses, one per line (optional)"
-            )
-            
-            # Subject and body
-            subject = st.text_input(
-                "Subject *",
-                placeholder="Enter email subject",
-                help="Email subject line"
-            )
-            
-            email_format = st.radio(
-                "Email Format",
-                options=["Plain Text", "HTML", "Both"],
-                help="Choose email format"
-            )
-            
-            body_text = ""
-            body_html = ""
-            
-            if email_format in ["Plain Text", "Both"]:
-                body_text = st.text_area(
-                    "Plain Text Body" + (" *" if email_format == "Plain Text" else ""),
-                    placeholder="Enter plain text content",
-                    height=150
+        send_mode = st.radio("Mode", ["Single Email", "Campaign (Mail Merge)"], horizontal=True, key="send_mode")
+        
+        if send_mode == "Campaign (Mail Merge)":
+            render_campaign()
+        else:
+            with st.form("send_email_form"):
+                st.subheader("Email Details")
+                
+                # Recipients
+                to_emails = st.text_area(
+                    "To (Recipients) *",
+                    placeholder="recipient1@enbox\nrecipient2@enbox",
+                    help="Separate addresses with commas, semicolons or new lines"
                 )
-            
-            if email_format in ["HTML", "Both"]:
-                body_html = st.text_area(
-                    "HTML Body" + (" *" if email_format == "HTML" else ""),
-                    placeholder="<p>Enter HTML content</p>",
-                    height=150
+                
+                cc_emails = st.text_area(
+                    "CC",
+                    placeholder="cc@enbox",
+                    help="Separate addresses with commas, semicolons or new lines (optional)"
                 )
-            
-            # Additional options
-            st.subheader("Options")
-            
-            col_a, col_b = st.columns(2)
-            
-            with col_a:
-                send_via = st.selectbox(
-                    "Send Via",
-                    options=["enbox", "smtp"],
-                    help="Select sending method"
+                
+                bcc_emails = st.text_area(
+                    "BCC",
+                    placeholder="bcc@enbox",
+                    help="Separate addresses with commas, semicolons or new lines (optional)"
                 )
                 
-                read_receipt = st.checkbox(
-                    "Request Read Receipt",
-                    help="Request read receipt notification"
+                # Subject and body
+                subject = st.text_input(
+                    "Subject *",
+                    placeholder="Enter email subject",
+                    help="Email subject line"
                 )
-            
-            with col_b:
-                schedule_email = st.checkbox(
-                    "Schedule Email",
-                    help="Schedule email for later delivery"
+                
+                email_format = st.radio(
+                    "Email Format",
+                    options=["Plain Text", "HTML", "Both"],
+                    help="Choose email format"
                 )
                 
-                scheduled_at = None
-                if schedule_email:
-                    schedule_date = st.date_input("Schedule Date")
-                    schedule_time = st.time_input("Schedule Time")
-                    scheduled_at = f"{schedule_date}T{schedule_time}:00Z"
-            
-            st.markdown("---")
-            send_submitted = st.form_submit_button("📤 Send Email", use_container_width=True)
-            
-            if send_submitted:
-                # Validation
-                errors = []
+                body_text = ""
+                body_html = ""
                 
-                if not to_emails.strip():
-                    errors.append("At least one recipient is required")
+                if email_format in ["Plain Text", "Both"]:
+                    body_text = st.text_area(
+                        "Plain Text Body" + (" *" if email_format == "Plain Text" else ""),
+                        placeholder="Enter plain text content",
+                        height=150
+                    )
                 
-                if not subject.strip():
-                    errors.append("Subject is required")
+                if email_format in ["HTML", "Both"]:
+                    body_html = st.text_area(
+                        "HTML Body" + (" *" if email_format == "HTML" else ""),
+                        placeholder="<p>Enter HTML content</p>",
+                        height=150
+                    )
                 
-                if email_format == "Plain Text" and not body_text.strip():
-                    errors.append("Plain text body is required")
+                # Additional options
+                st.subheader("Options")
                 
-                if email_format == "HTML" and not body_html.strip():
-                    errors.append("HTML body is required")
+                col_a, col_b = st.columns(2)
                 
-                if email_format == "Both" and not body_text.strip() and not body_html.strip():
-                    errors.append("At least one body format is required")
+                with col_a:
+                    send_via = st.selectbox(
+                        "Send Via",
+                        options=["enbox", "smtp"],
+                        help="Select sending method"
+                    )
+                    
+                    read_receipt = st.checkbox(
+                        "Request Read Receipt",
+                        help="Request read receipt notification"
+                    )
+                    
+                    optimize_html = st.checkbox(
+                        "Optimize HTML",
+                        value=True,
+                        help="Inline CSS, minify, and derive a plain-text body if there is none"
+                    )
                 
-                if errors:
-                    for error in errors:
-                        st.error(f"❌ {error}")
-                else:
-                    # Prepare email payload
-                    email_payload = {
-                        "to": [email.strip() for email in to_emails.split('\n') if email.strip()],
-                        "subject": subject,
-                        "send_via": send_via,
-                        "read_receipt_requested": read_receipt
-                    }
+                with col_b:
+                    schedule_email = st.checkbox(
+                        "Schedule Email",
+                        help="Schedule email for later delivery"
+                    )
+                    
+                    scheduled_at = None
+                    if schedule_email:
+                        schedule_date = st.date_input("Schedule Date (UTC)")
+                        schedule_time = st.time_input("Schedule Time (UTC)")
+                        scheduled_at = scheduled_at_from_inputs(schedule_date, schedule_time)
+                
+                attachment_files = st.file_uploader(
+                    "Attachments",
+                    accept_multiple_files=True,
+                    help="Encoded once and shared by every message the recipients are split into"
+                )
+                
+                st.markdown("---")
+                send_submitted = st.form_submit_button("📤 Send Email", use_container_width=True)
+                
+                if send_submitted:
+                    # Validation
+                    errors = []
+                    recipients = parse_recipients(to_emails, cc_emails, bcc_emails)
                     
-                    # Add CC if provided
-                    if cc_emails.strip():
-                        email_payload["cc"] = [email.strip() for email in cc_emails.split('\n') if email.strip()]
+                    if not recipients.to:
+                        errors.append("At least one recipient is required")
                     
-                    # Add BCC if provided
-                    if bcc_emails.strip():
-                        email_payload["bcc"] = [email.strip() for email in bcc_emails.split('\n') if email.strip()]
+                    if recipients.invalid:
+                        shown = ", ".join(recipients.invalid[:5])
+                        more = f" and {len(recipients.invalid) - 5} more" if len(recipients.invalid) > 5 else ""
+                        errors.append(f"Invalid email address(es): {shown}{more}")
                     
-                    # Add body content
-                    if body_text.strip():
-                        email_payload["body_text"] = body_text
+                    # Large lists become several messages under the recipient cap
+                    batches = []
+                    if recipients.to:
+                        try:
+                            batches = batch_recipients(recipients, get_max_recipients())
+                        except ValueError as e:
+                            errors.append(str(e))
                     
-                    if body_html.strip():
-                        email_payload["body_html"] = body_html
+                    if not subject.strip():
+                        errors.append("Subject is required")
                     
-                    # Add scheduled time if applicable
-                    if schedule_email and scheduled_at:
-                        email_payload["scheduled_at"] = scheduled_at
+                    if email_format == "Plain Text" and not body_text.strip():
+                        errors.append("Plain text body is required")
                     
-                    # Send email
-                    with st.spinner("Sending email..."):
-                        response, error = send_email(email_payload)
+                    if email_format == "HTML" and not body_html.strip():
+                        errors.append("HTML body is required")
+                    
+                    if email_format == "Both" and not body_text.strip() and not body_html.strip():
+                        errors.append("At least one body format is required")
+                    
+                    if errors:
+                        for error in errors:
+                            st.error(f"❌ {error}")
+                    else:
+                        # Fields shared by every message in the batch
+                        email_payload = {
+                            "subject": subject,
+                            "send_via": send_via,
+                            "read_receipt_requested": read_receipt
+                        }
+                        
+                        # Add body content
+                        if body_text.strip():
+                            email_payload["body_text"] = body_text
+                        
+                        if body_html.strip():
+                            email_payload["body_html"] = body_html
                         
-                        if error:
-                            st.error(f"❌ Error: {error}")
-                        elif response:
-                            if response.status_code in [200, 201]:
-                                st.success("✅ Email sent successfully!")
-                                
-                                # Display response data
-                                try:
-                                    result = response.json()
-                                    st.json(result)
-                                except:
-                                    st.write(response.text)
-                                
-                                st.balloons()
+                        # Add scheduled time if applicable
+                        if schedule_email and scheduled_at:
+                            email_payload["scheduled_at"] = scheduled_at
+                        
+                        # Processed once here and cached, not once per batch
+                        if optimize_html:
+                            email_payload = get_html_pipeline().prepare_payload(email_payload)
+                        
+                        # Messages carry references; the worker streams the encoded files at send time
+                        attachments = add_attachments(attachment_files)
+                        if attachments:
+                            email_payload["attachments"] = attachments
+                        
+                        # The outbox worker delivers the batches concurrently
+                        payloads = [
+                            {**email_payload, **{name: addresses for name, addresses in batch.items() if addresses}}
+                            for batch in batches
+                        ]
+                        
+                        # Queue for background delivery so the form returns immediately
+                        spool, worker = get_email_spool()
+                        if not spool:
+                            require_access_token()
+                        else:
+                            message_ids = spool.enqueue_many(payloads)
+                            worker.wake()
+                            if len(message_ids) == 1:
+                                st.success(f"📬 Email queued for delivery as message `{message_ids[0]}`")
                             else:
-                                st.error(f"❌ Error {response.status_code}: {response.text}")
-    
+                                st.success(f"📬 Email to {recipients.total} recipients queued as {len(message_ids)} messages")
+                                if len(message_ids) > len(recipients.to):
+                                    st.caption("Every message carries the full To list; CC and BCC are split between them")
+                            if recipients.duplicates:
+                                st.caption(f"Skipped {recipients.duplicates} duplicate address(es)")
+        
     with col2:
         st.info("""
         ### 📧 Email Guide
         
         **Recipients:**
-        - Enter one email per line
+        - Separate with commas, semicolons or new lines
+        - Duplicates across TO/CC/BCC are removed
+        - Large lists are split into several messages
+        - With few To addresses, To is repeated in each
         - TO is required
         - CC/BCC are optional
         
@@ -492,23 +1713,41 @@ with tab3:
         - Plain Text: Simple text
         - HTML: Rich formatted
         - Both: Best compatibility
+        - HTML is optimized: CSS inlined, minified, text derived
         
         **Send Via:**
         - enbox: Native delivery
         - smtp: Traditional SMTP
         
+        **Attachments:**
+        - Encoded once, however many messages
+        - Identical files are stored once
+        
         **Scheduling:**
-        - Optional future delivery
-        - Use ISO 8601 format
+        - Optional future delivery, in UTC
+        - Campaigns can spread sends over a window
+        
+        **Campaigns:**
+        - Upload a CSV with an email column
+        - Use {{column}} placeholders in templates
+        - Re-running a campaign skips recipients already sent
+        
+        **Delivery:**
+        - Emails are queued and sent in the background
+        - Failed sends are retried with backoff
+        - Track each message in the Outbox below
         
         **Tips:**
         - Test with plain text first
         - Verify recipient addresses
         - Use read receipts wisely
         """)
+    
+    render_outbox()
 
-# Tab 4: Enbox MSP API Documentation
-with tab4:
+# Section 4: Enbox MSP API Documentation
+def api_docs_page():
+    """Render the MSP API documentation section"""
     st.header("MSP API Documentation")
     
     st.markdown("How to use the MSP API")
@@ -614,3 +1853,234 @@ with tab4:
     "read_receipt_requested": false
   }' \\
   https://cmwvwqbrnxgofinkeevm.supabase.co/functions/v1/send-email""", language="bash")
+
+# Section 5: All Tenants
+TENANT_COLUMN = {"tenant": "Tenant"}
+
+def tenant_table(inventories):
+    """Merge tenant inventories into one table tagged by tenant, memoized per set of inventories in the session"""
+    key = [(inventory.tenant.name, id(inventory.enboxes)) for inventory in inventories]
+    memo = st.session_state.get("tenant_table_memo")
+    if memo and memo["key"] == key:
+        return memo["table"]
+    columns = {column: [] for column in [*TENANT_COLUMN, *TABLE_COLUMNS]}
+    for inventory in inventories:
+        columns["tenant"].extend([inventory.tenant.name] * len(inventory.enboxes))
+        for enbox in inventory.enboxes:
+            for column, value in enbox_row(enbox).items():
+                columns[column].append(value)
+    table = pd.DataFrame(columns)
+    st.session_state["tenant_table_memo"] = {"key": key, "table": table}
+    return table
+
+def all_tenants_page():
+    """Render every configured tenant's Enboxes in one view"""
+    st.header("All Tenants")
+    tenants = get_tenants()
+    
+    col1, col2 = st.columns([3, 1])
+    with col2:
+        force_refresh = st.button("🔄 Refresh All", use_container_width=True)
+    
+    fetched = {}
+    
+    def fetch(tenant):
+        # Each tenant goes through its own cache, mirror and coalescer; failures stay on its result
+        enboxes, fetched_at, error = fetch_enboxes(force_refresh=force_refresh, tenant=tenant)
+        if error:
+            raise RuntimeError(error)
+        if not isinstance(enboxes, list):
+            raise RuntimeError("Unexpected list_enboxes response")
+        fetched[tenant.name] = fetched_at
+        return enboxes
+    
+    def render_status(inventories):
+        status.dataframe(
+            pd.DataFrame([
+                {
+                    "tenant": inventory.tenant.name,
+                    "ok": "✅" if inventory.ok else "❌",
+                    "enboxes": len(inventory.enboxes) if inventory.ok else None,
+                    "active": sum(1 for enbox in inventory.enboxes if enbox.is_active) if inventory.ok else None,
+                    "latency_ms": inventory.elapsed * 1000,
+                    "as_of": fetched.get(inventory.tenant.name),
+                    "error": inventory.error or "",
+                }
+                for inventory in sorted(inventories, key=lambda inventory: tenants.index(inventory.tenant))
+            ]),
+            hide_index=True,
+            use_container_width=True,
+            column_config={"latency_ms": st.column_config.NumberColumn("Latency (ms)", format="%.0f")}
+        )
+    
+    with col1:
+        status = st.empty()
+    
+    # Tenants are listed concurrently and each appears as soon as it is done, so a slow one delays only itself
+    inventories = []
+    with st.spinner(f"Fetching {len(tenants)} tenants..."):
+        for inventory in fetch_inventories(tenants, fetch):
+            inventories.append(inventory)
+            render_status(inventories)
+    inventories.sort(key=lambda inventory: tenants.index(inventory.tenant))
+    
+    failed = [inventory for inventory in inventories if not inventory.ok]
+    if failed:
+        st.warning(f"⚠️ {len(failed)} tenant(s) could not be listed; the others are shown below.")
+    
+    available = [inventory for inventory in inventories if inventory.ok]
+    if not available:
+        return
+    
+    table = tenant_table(available)
+    filters = st.columns([2, 1, 1])
+    with filters[0]:
+        query = st.text_input("Search", placeholder="Email or display name", key="tenants_search")
+    with filters[1]:
+        selected_tenants = st.multiselect("Tenant", options=[inventory.tenant.name for inventory in available], key="tenants_filter")
+    with filters[2]:
+        statuses = st.multiselect("Status", options=sorted(table["status"].dropna().unique()), key="tenants_statuses")
+    
+    mask = pd.Series(True, index=table.index)
+    if query.strip():
+        needle = query.strip().lower()
+        mask &= (
+            table["email"].fillna("").str.lower().str.contains(needle, regex=False)
+            | table["display_name"].fillna("").str.lower().str.contains(needle, regex=False)
+        )
+    if selected_tenants:
+        mask &= table["tenant"].isin(selected_tenants)
+    if statuses:
+        mask &= table["status"].isin(statuses)
+    
+    st.caption(f"{int(mask.sum()):,} of {len(table):,} Enboxes across {len(available)} tenant(s)")
+    st.dataframe(
+        table[mask],
+        hide_index=True,
+        use_container_width=True,
+        column_config={**TENANT_COLUMN, **TABLE_COLUMNS}
+    )
+
+# Section 6: Diagnostics
+def get_diagnostics_settings():
+    """Get diagnostics options from Streamlit secrets, falling back to the environment"""
+    try:
+        settings = dict(st.secrets["diagnostics"])
+    except Exception:
+        settings = {}
+    enabled = settings.get("enabled", os.environ.get("ENBOX_DIAGNOSTICS", "") not in ("", "0", "false"))
+    port = settings.get("metrics_port", os.environ.get("ENBOX_METRICS_PORT"))
+    return bool(enabled), int(port) if port else None
+
+def histogram_rows(name, label_names):
+    """Summarize one histogram family into table rows"""
+    rows = []
+    for labels, histogram in metrics.REGISTRY.histograms(name):
+        rows.append({
+            **{label: labels.get(label) for label in label_names},
+            "count": histogram.count,
+            "mean_ms": histogram.sum / histogram.count * 1000,
+            "p50_ms": histogram.quantile(0.5) * 1000,
+            "p95_ms": histogram.quantile(0.95) * 1000,
+            "p99_ms": histogram.quantile(0.99) * 1000,
+        })
+    return sorted(rows, key=lambda row: [str(row[label]) for label in label_names])
+
+def diagnostics_page():
+    """Render request metrics, per-section script timing and the Prometheus export"""
+    st.header("Diagnostics")
+    st.caption("Process-wide since start-up, across all sessions. Percentiles are estimated from histogram buckets.")
+    
+    st.subheader("Upstream Requests")
+    request_rows = histogram_rows(metrics.REQUEST_DURATION, ["action", "status"])
+    if request_rows:
+        st.dataframe(pd.DataFrame(request_rows), hide_index=True, use_container_width=True)
+    else:
+        st.info("No upstream requests recorded yet.")
+    
+    cols = st.columns(3)
+    with cols[0]:
+        st.markdown("**Retries**")
+        retries = [{**labels, "retries": value} for labels, value in metrics.REGISTRY.counters(metrics.REQUEST_RETRIES)]
+        st.dataframe(pd.DataFrame(retries, columns=["action", "retries"]), hide_index=True, use_container_width=True)
+    with cols[1]:
+        st.markdown("**Errors**")
+        errors = [{**labels, "errors": value} for labels, value in metrics.REGISTRY.counters(metrics.REQUEST_ERRORS)]
+        st.dataframe(pd.DataFrame(errors, columns=["action", "reason", "errors"]), hide_index=True, use_container_width=True)
+    with cols[2]:
+        st.markdown("**Coalesced**")
+        coalesced = [{**labels, "shared": value} for labels, value in metrics.REGISTRY.counters(metrics.REQUEST_COALESCED)]
+        st.dataframe(pd.DataFrame(coalesced, columns=["action", "shared"]), hide_index=True, use_container_width=True)
+    
+    st.subheader("Rate Limiters")
+    st.caption("Concurrency limits shrink on 429/5xx responses and grow back on success.")
+    limiters = ratelimit.snapshots()
+    if limiters:
+        st.dataframe(pd.DataFrame(limiters), hide_index=True, use_container_width=True)
+    
+    st.subheader("Script Runs by Section")
+    render_rows = histogram_rows(metrics.RENDER_DURATION, ["section"])
+    if render_rows:
+        st.dataframe(pd.DataFrame(render_rows), hide_index=True, use_container_width=True)
+    last_run = st.session_state.get("last_script_run")
+    if last_run:
+        st.caption(
+            f"Last rerun in this session: {last_run['section']} section {last_run['section_ms']:.0f} ms, "
+            f"whole script {last_run['total_ms']:.0f} ms"
+        )
+    
+    st.subheader("Prometheus Export")
+    exposition = metrics.REGISTRY.to_prometheus()
+    _, port = get_diagnostics_settings()
+    if port:
+        st.caption(f"Scrape endpoint: http://<host>:{port}/metrics")
+    st.download_button("⬇️ Download metrics", data=exposition, file_name="metrics.prom", mime="text/plain")
+    with st.expander("View exposition text"):
+        st.code(exposition, language="")
+    
+    if st.button("Reset metrics"):
+        metrics.REGISTRY.reset()
+        st.rerun()
+
+# Sections are pages rather than tabs so only the active one runs on each rerun;
+# st.tabs would execute every tab body, including the list_enboxes fetch
+pages = [
+    st.Page(manage_enboxes_page, title="Manage Enboxes", icon="⚙️", url_path="manage", default=True),
+    st.Page(create_enboxes_page, title="Create Enboxes", icon="➕", url_path="create"),
+    st.Page(send_email_page, title="Send Email", icon="📧", url_path="send"),
+    st.Page(api_docs_page, title="Enbox MSP API", icon="📋", url_path="api"),
+]
+
+configure_rate_limits()
+
+# With several MSP accounts configured, every page works on the one selected here
+tenants = get_tenants()
+if len(tenants) > 1:
+    st.sidebar.selectbox(
+        "Tenant",
+        options=[tenant.name for tenant in tenants],
+        key="tenant",
+        help="MSP account used by every page; All Tenants shows them together"
+    )
+    pages.insert(1, st.Page(all_tenants_page, title="All Tenants", icon="🏢", url_path="tenants"))
+
+diagnostics_enabled, metrics_port = get_diagnostics_settings()
+if diagnostics_enabled:
+    pages.append(st.Page(diagnostics_page, title="Diagnostics", icon="📈", url_path="diagnostics"))
+if metrics_port:
+    metrics.start_metrics_server(metrics_port)
+
+navigation = st.navigation(pages, position="top")
+
+section_started = time.perf_counter()
+try:
+    navigation.run()
+finally:
+    # Runs on st.rerun()/st.stop() too, which unwind through here as exceptions
+    finished = time.perf_counter()
+    metrics.record_render(navigation.title, finished - section_started)
+    st.session_state["last_script_run"] = {
+        "section": navigation.title,
+        "section_ms": (finished - section_started) * 1000,
+        "total_ms": (finished - SCRIPT_STARTED) * 1000,
+    }
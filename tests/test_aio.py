@@ -0,0 +1,43 @@
+"""AsyncMSPClient.map keeps one bad item from affecting the rest"""
+import asyncio
+
+import pytest
+
+from enbox_msp.aio import AsyncMSPClient
+
+def test_map_turns_item_errors_into_failed_results():
+    async def activate_enbox(email):
+        if email == "bad@example.com":
+            raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+        await asyncio.sleep(0.01)
+        return email
+
+    async def run():
+        async with AsyncMSPClient(api_key="key", concurrency=4) as client:
+            return await client.map(activate_enbox, ["a@example.com", "bad@example.com", "b@example.com"])
+
+    results = asyncio.run(run())
+    failed = [result for result in results if not isinstance(result, str)]
+    assert sorted(result for result in results if isinstance(result, str)) == ["a@example.com", "b@example.com"]
+    assert len(failed) == 1 and failed[0].key == "bad@example.com" and not failed[0].ok
+
+def test_map_stops_workers_before_raising():
+    finished = []
+
+    async def slow(item):
+        await asyncio.sleep(0.2)
+        finished.append(item)
+
+    def items():
+        yield 1
+        yield 2
+        raise RuntimeError("input failed")
+
+    async def run():
+        async with AsyncMSPClient(api_key="key", concurrency=4) as client:
+            with pytest.raises(RuntimeError):
+                await client.map(slow, items())
+        await asyncio.sleep(0.3)
+
+    asyncio.run(run())
+    assert finished == []
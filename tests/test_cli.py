@@ -0,0 +1,16 @@
+"""bulk-send input lines are checked before anything is sent"""
+import pytest
+
+from enbox_msp.cli import parse_send_payload
+
+def test_parse_send_payload_accepts_a_payload():
+    assert parse_send_payload('{"to": ["a@example.com"], "subject": "Hi"}')["subject"] == "Hi"
+
+@pytest.mark.parametrize("line, error", [
+    ("not json", "Invalid JSON"),
+    ("[1, 2]", "Expected a JSON object"),
+    ('{"subject": "Hi"}', "to and subject are required"),
+])
+def test_parse_send_payload_rejects_bad_lines(line, error):
+    with pytest.raises(ValueError, match=error):
+        parse_send_payload(line)
@@ -0,0 +1,11 @@
+"""Inlined CSS keeps responsive overrides working"""
+from enbox_msp.htmlbody import minify_html
+
+def test_media_rules_override_inlined_styles():
+    processed = minify_html("<style>p{color:red}@media(max-width:600px){p{color:green}}</style><p>Hi</p>")
+    assert '<p style="color:red">' in processed
+    assert "@media(max-width:600px){p{color:green !important}}" in processed
+
+def test_media_rules_already_important_are_left_alone():
+    processed = minify_html("<style>p{color:red}@media print{p{color:black!important}}</style><p>Hi</p>")
+    assert "color:black!important}" in processed
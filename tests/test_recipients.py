@@ -0,0 +1,26 @@
+"""Recipient batching keeps every message addressed"""
+import pytest
+
+from enbox_msp.recipients import batch_recipients, parse_recipients
+
+def bcc_list(count):
+    return "\n".join(f"user{number}@example.com" for number in range(count))
+
+def test_single_to_is_repeated_in_every_batch():
+    recipients = parse_recipients("me@corp.com", bcc=bcc_list(120))
+    batches = batch_recipients(recipients, 50)
+    assert all(batch["to"] == ["me@corp.com"] for batch in batches)
+    assert all(len(batch["to"]) + len(batch["cc"]) + len(batch["bcc"]) <= 50 for batch in batches)
+    assert sorted(address for batch in batches for address in batch["bcc"]) == sorted(recipients.bcc)
+
+def test_to_addresses_are_spread_when_there_are_enough():
+    recipients = parse_recipients(bcc_list(120), cc="boss@corp.com")
+    batches = batch_recipients(recipients, 50)
+    assert len(batches) == 3
+    assert sorted(address for batch in batches for address in batch["to"]) == sorted(recipients.to)
+    assert all(batch["to"] for batch in batches)
+
+def test_to_list_too_long_to_repeat():
+    recipients = parse_recipients(bcc_list(3), bcc=bcc_list(200).replace("user", "other"))
+    with pytest.raises(ValueError, match="move some To addresses"):
+        batch_recipients(recipients, 3)
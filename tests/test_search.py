@@ -0,0 +1,16 @@
+"""Text search finds customers by their domain"""
+from enbox_msp.models import Enbox
+from enbox_msp.search import EnboxIndex
+
+ENBOXES = [
+    Enbox("alice@acme.example", "Alice Smith"),
+    Enbox("bob@globex.example", "Bob Jones"),
+    Enbox("carol@globex.example", "Carol Acme"),
+]
+
+def test_search_by_full_domain():
+    assert EnboxIndex(ENBOXES).search("globex.example") == [1, 2]
+
+def test_search_by_at_domain():
+    assert EnboxIndex(ENBOXES).search("@acme") == [0]
+    assert EnboxIndex(ENBOXES).search("@globex.example") == [1, 2]
@@ -0,0 +1,77 @@
+"""Coalesced calls share results and Exceptions, but never a caller's own BaseException"""
+import threading
+
+import pytest
+
+from enbox_msp.singleflight import SingleFlight
+
+class Rerun(BaseException):
+    """Stands in for Streamlit's RerunException"""
+
+def test_progress_callback_error_stays_with_its_caller():
+    flight = SingleFlight()
+    reported = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def load(report):
+        report(1)
+        release.wait(5)
+        return "inventory"
+
+    def leader_progress(value):
+        reported.set()
+        raise Rerun()
+
+    def follower():
+        results["follower"] = flight.do_with_progress("key", load, lambda value: None)
+
+    with pytest.raises(Rerun):
+        flight.do_with_progress("key", load, leader_progress)
+    assert reported.is_set()
+    thread = threading.Thread(target=follower)
+    thread.start()
+    release.set()
+    thread.join(5)
+    assert results == {"follower": "inventory"}
+
+def test_base_exception_is_not_shared():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def leader():
+        started.set()
+        release.wait(5)
+        raise Rerun()
+
+    def follower():
+        results["follower"] = flight.do("key", lambda: "inventory")
+
+    def run_leader():
+        with pytest.raises(Rerun):
+            flight.do("key", leader)
+
+    leader_thread = threading.Thread(target=run_leader)
+    leader_thread.start()
+    started.wait(5)
+    follower_thread = threading.Thread(target=follower)
+    follower_thread.start()
+    release.set()
+    leader_thread.join(5)
+    follower_thread.join(5)
+    assert results == {"follower": "inventory"}
+
+def test_exception_is_shared_but_not_reused():
+    flight = SingleFlight(window=60)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ValueError("upstream down")
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            flight.do("key", fail)
+    assert len(calls) == 2
@@ -0,0 +1,44 @@
+"""The shared rate limiter gets its slot back whatever a request fails with"""
+import asyncio
+
+import pytest
+import requests
+from aiohttp import web
+
+from enbox_msp import ratelimit
+from enbox_msp.aio import AsyncMSPClient
+from enbox_msp.transport import HttpClient
+
+def test_unexpected_error_releases_slot():
+    limiter = ratelimit.configure("leak-sync", initial_concurrency=2)
+    client = HttpClient()
+    for _ in range(3):
+        # No scheme: requests raises MissingSchema before connecting
+        with pytest.raises(requests.exceptions.MissingSchema):
+            client.post("api.invalid/leak-sync", {}, {"action": "list_enboxes"})
+    assert limiter.concurrency.in_flight == 0
+
+def test_async_unexpected_error_releases_slot():
+    limiter = ratelimit.configure("leak-async", initial_concurrency=2)
+
+    async def undecodable(request):
+        return web.Response(body=b"\xff\xfe not utf-8", content_type="text/plain", charset="utf-8")
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/leak-async", undecodable)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            async with AsyncMSPClient(api_key="key", api_url=f"http://127.0.0.1:{port}/leak-async") as client:
+                for _ in range(3):
+                    with pytest.raises(UnicodeDecodeError):
+                        await client.call("list_enboxes")
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+    assert limiter.concurrency.in_flight == 0